@@ -45,6 +45,11 @@ def do_run_migrations(connection: Connection) -> None:
         context.run_migrations()
 
 def run_migrations_online() -> None:
+    # Conexión ya abierta (p. ej. la BD de pruebas de tests/conftest.py): se usa tal cual
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+        return
     engine = create_engine(
         DB_URL_SYNC,
         poolclass=pool.NullPool,
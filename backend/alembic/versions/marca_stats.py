@@ -0,0 +1,82 @@
+# alembic/versions/0003_marca_stats.py
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003_marca_stats"
+down_revision = "0002_marcas_search_trgm"
+branch_labels = None
+depends_on = None
+
+# Aporte de cada fila de `alias` a los contadores, con signo `sign`:
+#   ('estado', <estado>)        -> una por marca
+#   ('aprobadas', 'YYYY-MM')    -> marcas ACTIVA por mes (UTC) de approved_at
+def _contributions(alias: str, sign: int) -> str:
+    return f"""
+        SELECT 'estado' AS dimension, estado AS clave, {sign} AS delta FROM {alias}
+        UNION ALL
+        SELECT 'aprobadas', to_char(approved_at AT TIME ZONE 'UTC', 'YYYY-MM'), {sign}
+        FROM {alias} WHERE estado = 'ACTIVA' AND approved_at IS NOT NULL
+    """
+
+def _apply(*parts: str) -> str:
+    # Suma deltas por clave y los aplica; ORDER BY fija el orden de bloqueo
+    # (evita deadlocks entre transacciones concurrentes)
+    union = " UNION ALL ".join(f"({p})" for p in parts)
+    return f"""
+        INSERT INTO marca_stats (dimension, clave, total)
+        SELECT dimension, clave, sum(delta) FROM ({union}) d
+        GROUP BY dimension, clave
+        HAVING sum(delta) <> 0
+        ORDER BY dimension, clave
+        ON CONFLICT (dimension, clave) DO UPDATE SET total = marca_stats.total + EXCLUDED.total;
+    """
+
+def upgrade() -> None:
+    op.create_table(
+        "marca_stats",
+        sa.Column("dimension", sa.String(length=20), primary_key=True),
+        sa.Column("clave", sa.String(length=32), primary_key=True),
+        sa.Column("total", sa.BigInteger, nullable=False, server_default="0"),
+    )
+
+    # Triggers por sentencia con tablas de transición: un INSERT/COPY masivo
+    # actualiza los contadores una sola vez, no fila a fila
+    op.execute(f"""
+        CREATE FUNCTION marca_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {_apply(_contributions('nuevas', 1))}
+            ELSIF TG_OP = 'UPDATE' THEN
+                {_apply(_contributions('nuevas', 1), _contributions('viejas', -1))}
+            ELSE
+                {_apply(_contributions('viejas', -1))}
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+    """)
+    # Sin escrituras en marcas mientras se instalan triggers y se hace el backfill
+    op.execute("LOCK TABLE marcas IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("""
+        CREATE TRIGGER marca_stats_ins AFTER INSERT ON marcas
+        REFERENCING NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION marca_stats_apply()
+    """)
+    op.execute("""
+        CREATE TRIGGER marca_stats_upd AFTER UPDATE ON marcas
+        REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION marca_stats_apply()
+    """)
+    op.execute("""
+        CREATE TRIGGER marca_stats_del AFTER DELETE ON marcas
+        REFERENCING OLD TABLE AS viejas
+        FOR EACH STATEMENT EXECUTE FUNCTION marca_stats_apply()
+    """)
+    op.execute(_apply(_contributions("marcas", 1)))
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS marca_stats_del ON marcas")
+    op.execute("DROP TRIGGER IF EXISTS marca_stats_upd ON marcas")
+    op.execute("DROP TRIGGER IF EXISTS marca_stats_ins ON marcas")
+    op.execute("DROP FUNCTION IF EXISTS marca_stats_apply()")
+    op.drop_table("marca_stats")
@@ -0,0 +1,14 @@
+# alembic/versions/0005_marcas_created_at_index.py
+from alembic import op
+
+revision = "0005_marcas_created_at_index"
+down_revision = "0004_marcas_updated_at"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Rango por created_at de /detalles/series (registros); approved_at ya tiene índice (0001)
+    op.create_index("ix_marcas_created_at", "marcas", ["created_at"])
+
+def downgrade() -> None:
+    op.drop_index("ix_marcas_created_at", table_name="marcas")
@@ -0,0 +1,35 @@
+# alembic/versions/0006_marcas_query_indexes.py
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006_marcas_query_indexes"
+down_revision = "0005_marcas_created_at_index"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Últimas N (/detalles): ORDER BY created_at DESC, id DESC LIMIT n sin ordenar.
+    # También sirve los rangos por created_at de /detalles/series, así que sustituye a 0005
+    op.create_index(
+        "ix_marcas_created_at_id", "marcas", [sa.text("created_at DESC"), sa.text("id DESC")]
+    )
+    op.drop_index("ix_marcas_created_at", table_name="marcas")
+    # Aprobadas del mes / serie de aprobaciones: solo filas ACTIVA, rango sobre approved_at
+    # (index-only: el count no necesita más columnas)
+    op.create_index(
+        "ix_marcas_approved_activa",
+        "marcas",
+        ["approved_at"],
+        postgresql_where=sa.text("estado = 'ACTIVA'"),
+    )
+    # GET /marcas/?estado=...: filtro + keyset/orden por id en el mismo índice.
+    # ix_marcas_estado (0001) es su prefijo: sobra
+    op.create_index("ix_marcas_estado_id", "marcas", ["estado", "id"])
+    op.drop_index("ix_marcas_estado", table_name="marcas")
+
+def downgrade() -> None:
+    op.create_index("ix_marcas_estado", "marcas", ["estado"])
+    op.drop_index("ix_marcas_estado_id", table_name="marcas")
+    op.drop_index("ix_marcas_approved_activa", table_name="marcas")
+    op.create_index("ix_marcas_created_at", "marcas", ["created_at"])
+    op.drop_index("ix_marcas_created_at_id", table_name="marcas")
@@ -0,0 +1,30 @@
+# alembic/versions/0002_marcas_search_trgm.py
+from alembic import op
+
+revision = "0002_marcas_search_trgm"
+down_revision = "0001_create_marca_table"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Trigramas: permiten que ILIKE '%x%' y 'x%' usen índice (GIN) en vez de seq scan
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_marcas_titulo_trgm",
+        "marcas",
+        ["titulo"],
+        postgresql_using="gin",
+        postgresql_ops={"titulo": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_marcas_nombre_trgm",
+        "marcas",
+        ["nombre"],
+        postgresql_using="gin",
+        postgresql_ops={"nombre": "gin_trgm_ops"},
+    )
+
+def downgrade() -> None:
+    op.drop_index("ix_marcas_nombre_trgm", table_name="marcas")
+    op.drop_index("ix_marcas_titulo_trgm", table_name="marcas")
+    # la extensión se deja instalada: puede usarla otro esquema
@@ -0,0 +1,28 @@
+# alembic/versions/0004_marcas_updated_at.py
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004_marcas_updated_at"
+down_revision = "0003_marca_stats"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # DEFAULT now() es estable: PG lo guarda como valor por defecto "rápido" y no
+    # reescribe la tabla. Las filas existentes quedan con la hora de la migración
+    # (un UPDATE masivo dispararía además los triggers de marca_stats sobre todo)
+    op.add_column(
+        "marcas",
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    # max(updated_at): versión de la colección para los 304 de GET /marcas/
+    op.create_index("ix_marcas_updated_at", "marcas", ["updated_at"])
+
+def downgrade() -> None:
+    op.drop_index("ix_marcas_updated_at", table_name="marcas")
+    op.drop_column("marcas", "updated_at")
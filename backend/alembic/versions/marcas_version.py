@@ -0,0 +1,40 @@
+# alembic/versions/0007_marcas_version.py
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0007_marcas_version"
+down_revision = "0006_marcas_query_indexes"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Versión de la colección para el ETag de GET /marcas/ (fila única)
+    op.create_table(
+        "marcas_version",
+        sa.Column("id", sa.SmallInteger, primary_key=True),
+        sa.Column("version", sa.BigInteger, nullable=False, server_default="0"),
+        sa.CheckConstraint("id = 1", name="ck_marcas_version_unica"),
+    )
+    op.execute("INSERT INTO marcas_version (id, version) VALUES (1, 0)")
+
+    # BEFORE y por sentencia: la transacción bloquea la fila antes de tocar marcas
+    # (y antes que los triggers de marca_stats, así que no hay interbloqueos) y la
+    # retiene hasta el commit. Las escrituras se serializan aquí, de modo que el
+    # contador sube en orden de commit y el que lee una versión ve todo lo anterior
+    op.execute("""
+        CREATE FUNCTION marcas_version_bump() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE marcas_version SET version = version + 1 WHERE id = 1;
+            RETURN NULL;
+        END;
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER marcas_version_bump BEFORE INSERT OR UPDATE OR DELETE OR TRUNCATE ON marcas
+        FOR EACH STATEMENT EXECUTE FUNCTION marcas_version_bump()
+    """)
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS marcas_version_bump ON marcas")
+    op.execute("DROP FUNCTION IF EXISTS marcas_version_bump()")
+    op.drop_table("marcas_version")
@@ -1,7 +1,32 @@
-from typing import AsyncGenerator
-from bd.session import get_session
+from collections.abc import AsyncGenerator
+
+from fastapi import Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+from bd.session import get_read_session, get_session, replicas
+from core.config import settings
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+async def get_db(request: Request, response: Response) -> AsyncGenerator[AsyncSession, None]:
+    # Sesión del primario. En escrituras marca al cliente para que sus próximas
+    # lecturas vayan también al primario (read-your-writes frente al retraso de réplica)
+    if replicas.enabled and request.method not in SAFE_METHODS:
+        response.set_cookie(
+            settings.REPLICA_STICKY_COOKIE,
+            "1",
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
     async for s in get_session():
         yield s
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    # Solo lectura: réplica, salvo justo después de una escritura de este cliente
+    if request.cookies.get(settings.REPLICA_STICKY_COOKIE):
+        async for s in get_session():
+            yield s
+        return
+    async for s in get_read_session():
+        yield s
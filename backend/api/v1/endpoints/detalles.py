@@ -1,17 +1,49 @@
 # app/api/v1/endpoints/detalles.py  (sin cambios, solo apunta al nuevo método)
-from fastapi import APIRouter, Depends
+from datetime import date
+from typing import Literal
+
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from api.deps import get_db
+
+from api.deps import get_read_db
 from services.metrics_service import MetricsService
+from utils.etag import none_match, payload_etag
 
 router = APIRouter(tags=["detalles"])
 service = MetricsService()
 
 @router.get("/detalles")
-async def get_detalles(db: AsyncSession = Depends(get_db)):
+async def get_detalles(
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+):
     """
     Calcula desde BD:
       - stats: registradas, pendientes (INACTIVA), vencimientos (INACTIVA), aprobadas este mes (approved_at)
       - ultimas_registradas: 3 más recientes por created_at
+    ETag = hash del cuerpo: con If-None-Match igual responde 304 sin cuerpo.
     """
-    return await service.get_stats_and_last3(db)
+    body = orjson.dumps(await service.get_stats_and_last3(db))
+    etag = payload_etag(body)
+    if none_match(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/detalles/series")
+async def get_detalles_series(
+    metrica: Literal["registros", "aprobaciones"] = Query("registros", description="registros: created_at · aprobaciones: ACTIVA por approved_at"),
+    granularidad: Literal["day", "week", "month"] = Query("day"),
+    desde: date | None = Query(None, description="Por defecto, 30 días antes de `hasta`"),
+    hasta: date | None = Query(None, description="Incluido; por defecto hoy (en `tz`)"),
+    tz: str = Query("UTC", description="Zona IANA para cortar los buckets, p. ej. America/Bogota"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Serie temporal de registros o aprobaciones por día, semana o mes."""
+    try:
+        return await service.get_series(
+            db, metric=metrica, granularity=granularidad, tz=tz, desde=desde, hasta=hasta
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
@@ -0,0 +1,50 @@
+# app/api/v1/endpoints/eventos.py
+import asyncio
+from collections.abc import AsyncIterator
+
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import StreamingResponse
+
+from core.config import settings
+from core.events import RESET_EVENT_TYPE, Event, Subscription, event_bus
+
+router = APIRouter(tags=["eventos"])
+
+
+async def _stream(sub: Subscription, backlog: list[Event] | None) -> AsyncIterator[bytes]:
+    try:
+        yield b"retry: %d\n\n" % settings.EVENTS_RETRY_MS
+        if backlog is None:
+            # El Last-Event-ID ya no está en el buffer: el cliente debe recargar
+            yield b"event: %s\ndata: {}\n\n" % RESET_EVENT_TYPE.encode()
+        else:
+            for event in backlog:
+                yield event.frame
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), settings.EVENTS_HEARTBEAT_SECONDS)
+            except TimeoutError:
+                # Comentario SSE: mantiene viva la conexión en proxies y detecta clientes idos
+                yield b": ping\n\n"
+                continue
+            if event is None:
+                # Cliente lento desconectado; EventSource reconecta con Last-Event-ID
+                break
+            yield event.frame
+    finally:
+        event_bus.unsubscribe(sub)
+
+
+@router.get("/eventos")
+async def get_eventos(
+    last_event_id: str | None = Header(None, description="Reanudar tras este evento"),
+    last_id: str | None = Query(None, alias="lastEventId", description="Igual que Last-Event-ID (para clientes sin cabeceras)"),
+):
+    """
+    Feed Server-Sent Events de cambios en marcas: marca.created|updated|deleted,
+    marcas.<op> (masivas), marcas.imported y stats (resumen de /detalles con delta).
+    `reset` indica que pudieron perderse eventos: volver a pedir los datos.
+    """
+    sub, backlog = event_bus.subscribe(last_event_id or last_id)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(_stream(sub, backlog), media_type="text/event-stream", headers=headers)
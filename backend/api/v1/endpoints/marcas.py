@@ -1,105 +1,277 @@
-from typing import List, Optional
-from fastapi import APIRouter, Query, Depends, HTTPException, status
+from typing import Any, Literal
+
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.deps import get_db
-from services.index import MarcaService
+from api.deps import get_db, get_read_db
+from bd.session import AsyncSessionLocal, read_sessionmaker
+from core.config import settings
 from schemas import Marca as schemas  # asumiendo Pydantic v2
+from services.import_service import MarcaImportService
+from services.index import MarcaService
+from utils.etag import PreconditionFailed, if_match_versions, marca_etag, none_match
+
 # Si tienes un Enum de estado:
 # from schemas.Marca import EstadoEnum
 
 router = APIRouter(prefix="/marcas", tags=["marcas"])
 service = MarcaService()
+import_service = MarcaImportService()
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
-@router.get("/", response_model=List[schemas.Marca])
+
+@router.get("/", response_model=list[schemas.Marca] | schemas.MarcaPage)
 async def get_all_marcas(
-    search: Optional[str] = Query(None, description="Búsqueda por titulo/nombre"),
+    request: Request,
+    search: str | None = Query(None, description="Búsqueda por titulo/nombre"),
     # Si tienes Enum: estado: Optional[EstadoEnum] = Query(None, description="Filtrar por estado"),
-    estado: Optional[str] = Query(None, description="Filtrar por estado"),
+    estado: str | None = Query(None, description="Filtrar por estado"),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
-    db: AsyncSession = Depends(get_db),
-) -> List[schemas.Marca]:
+    after: str | None = Query(None, description="Cursor opaco (X-Next-Cursor de la página anterior)"),
+    match: Literal["contains", "prefix"] = Query("contains", description="contains: %x% · prefix: typeahead x%"),
+    rank: bool = Query(False, description="Ordenar por similitud con `search`"),
+    total: Literal["none", "exact", "estimate"] = Query(
+        "none", description="Con exact|estimate responde {items, total, total_exact, next_cursor}"
+    ),
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+):
     assert isinstance(db, AsyncSession), type(db)
     try:
-        marcas = await service.list_marcas(db, search=search, estado=estado, limit=limit, offset=offset)
-        # Si tus modelos Pydantic tienen from_attributes activado puedes devolver ORM directo:
-        # return marcas
-        return [schemas.Marca.model_validate(m) for m in marcas]
+        etag = None
+        if settings.LIST_ETAG_ENABLED:
+            # Versión de la colección antes que la página: si una escritura se cuela en
+            # medio, el ETag queda viejo y la siguiente petición baja la página otra vez
+            etag = await service.list_etag(
+                db, search=search, estado=estado, match=match, page_key=request.url.query
+            )
+            if none_match(if_none_match, etag):
+                return _not_modified(etag)
+        page = await service.list_marcas_page(
+            db,
+            search=search,
+            estado=estado,
+            limit=limit,
+            offset=offset,
+            after=after,
+            match=match,
+            rank=rank,
+            total=total,
+        )
+        headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else {}
+        if etag:
+            headers["ETag"] = etag
+        # Ruta rápida: las filas ya traen exactamente las columnas de schemas.Marca y los
+        # tipos los garantiza la BD; se serializan directo con orjson. Al devolver un
+        # Response, FastAPI no revalida contra response_model (que queda para OpenAPI).
+        if total == "none":
+            return ORJSONResponse(page.items, headers=headers)
+        return ORJSONResponse(
+            {
+                "items": page.items,
+                "total": page.total,
+                "total_exact": page.total_exact,
+                "next_cursor": page.next_cursor,
+            },
+            headers=headers,
+        )
     except ValueError as e:
         # p. ej. estado inválido
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+# export y bulk: declarados antes de /{id} para que no se interpreten como id
+@router.get("/export")
+async def export_marcas(
+    request: Request,
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="ndjson | csv"),
+    search: str | None = Query(None, description="Búsqueda por titulo/nombre"),
+    estado: str | None = Query(None, description="Filtrar por estado"),
+    match: Literal["contains", "prefix"] = Query("contains"),
+    gzip: bool | None = Query(None, description="Forzar gzip; por defecto según Accept-Encoding"),
+):
+    """Vuelca todas las marcas filtradas en streaming (memoria constante)."""
+    if gzip is None:
+        gzip = "gzip" in request.headers.get("accept-encoding", "")
+    # Lectura larga: a una réplica si hay (salvo read-your-writes, ver api/deps.py)
+    sticky = request.cookies.get(settings.REPLICA_STICKY_COOKIE)
+    session_factory = AsyncSessionLocal if sticky else read_sessionmaker()
+    try:
+        body = service.export_marcas(
+            session_factory, fmt=format, search=search, estado=estado, match=match, gzip=gzip
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    headers = {"Content-Disposition": f'attachment; filename="marcas.{format}"', "Vary": "Accept-Encoding"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
+
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_marcas(
+    request: Request,
+    format: Literal["csv", "ndjson"] = Query("csv", description="csv (con cabecera) | ndjson"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Importa el cuerpo de la petición en streaming (admite Content-Encoding: gzip).
+    Las filas que no validan contra MarcaCreate se informan y no se cargan.
+    """
+    gzip = request.headers.get("content-encoding", "").lower() == "gzip"
+    try:
+        return await import_service.import_stream(db, request.stream(), fmt=format, gzip=gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.post("/bulk", response_model=schemas.BulkResult)
+async def bulk_create_marcas(
+    items: list[Any] = Body(..., description="Lista de MarcaCreate; cada item se valida por separado"),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        return await service.bulk_create_marcas(db, items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.patch("/bulk", response_model=schemas.BulkResult)
+async def bulk_patch_marcas(
+    items: list[Any] = Body(..., description="Lista de MarcaPatch con id"),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        return await service.bulk_update_marcas(db, items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.delete("/bulk", response_model=schemas.BulkResult)
+async def bulk_delete_marcas(
+    ids: list[int] = Body(..., description="Ids a eliminar"),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        return await service.bulk_delete_marcas(db, ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
 
 
 @router.get("/{id}", response_model=schemas.Marca)
 async def get_marca_by_id(
     id: int,
-    db: AsyncSession = Depends(get_db),
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
 ) -> schemas.Marca:
     try:
         marca = await service.get_marca(db, id)
         if not marca:
             raise HTTPException(status_code=404, detail="invalid Marca id provided")
+        etag = marca_etag(marca.id, marca.updated_at)
+        if none_match(if_none_match, etag):
+            return _not_modified(etag)
+        response.headers["ETag"] = etag
         return schemas.Marca.model_validate(marca)
     except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=str(e)) from e
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
 
 
 @router.post("/", response_model=schemas.Marca, status_code=status.HTTP_201_CREATED)
 async def create_marca(
     marca: schemas.MarcaCreate,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
     assert isinstance(db, AsyncSession), type(db)
     try:
         created = await service.create_marca(db, data=marca)
+        response.headers["ETag"] = marca_etag(created.id, created.updated_at)
         return schemas.Marca.model_validate(created)
     except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
 
 
 @router.patch("/{id}", response_model=schemas.Marca)
 async def patch_marca(
     body: schemas.MarcaPatch,
     id: int,
+    response: Response,
+    if_match: str | None = Header(None, description="ETag de la versión leída (concurrencia optimista)"),
     db: AsyncSession = Depends(get_db),
 ):
     assert isinstance(db, AsyncSession), type(db)
     try:
-        db_update = await service.update_marca(db, id, changes=body)
+        db_update = await service.update_marca(
+            db, id, changes=body, if_match=if_match_versions(if_match, id)
+        )
         if not db_update:
             raise HTTPException(status_code=404, detail="Marca Not Found")
+        response.headers["ETag"] = marca_etag(db_update.id, db_update.updated_at)
         return schemas.Marca.model_validate(db_update)
+    except PreconditionFailed as e:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=str(e)) from e
     except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=str(e)) from e
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
 
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_marca(
     id: int,
+    if_match: str | None = Header(None, description="ETag de la versión leída (concurrencia optimista)"),
     db: AsyncSession = Depends(get_db),
 ):
     assert isinstance(db, AsyncSession), type(db)
     try:
-        deleted = await service.delete_marca(db, id)
+        deleted = await service.delete_marca(db, id, if_match=if_match_versions(if_match, id))
         if not deleted:
             raise HTTPException(status_code=404, detail="the ID provided is incorrect")
         # 204: sin body
         return
+    except PreconditionFailed as e:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=str(e)) from e
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=str(e)) from e
@@ -0,0 +1,39 @@
+# app/api/v1/endpoints/sistema.py
+from fastapi import APIRouter
+
+from bd.session import pool_stats, replicas
+from core.cache import marca_cache, stats_cache
+from core.events import event_bus
+from core.ratelimit import admission_stats
+
+router = APIRouter(prefix="/sistema", tags=["sistema"])
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Contadores de la caché en proceso de este worker (hits, misses, evictions...)."""
+    return {"marcas": marca_cache.stats(), "detalles": stats_cache.stats()}
+
+
+@router.get("/pool")
+async def get_pool_stats():
+    """Estado del pool de conexiones de este worker: en uso, overflow y espera por checkout."""
+    return pool_stats()
+
+
+@router.get("/eventos")
+async def get_event_stats():
+    """Feed SSE de este worker: clientes conectados, eventos en buffer y clientes lentos desconectados."""
+    return event_bus.stats()
+
+
+@router.get("/replicas")
+async def get_replica_stats():
+    """Réplicas de lectura de este worker: salud, retraso de replicación y pool."""
+    return replicas.stats()
+
+
+@router.get("/admision")
+async def get_admission_stats():
+    """Rate limit y colas de admisión de este worker: en curso, en espera y rechazadas."""
+    return admission_stats()
@@ -1,7 +1,9 @@
 from fastapi import APIRouter
-from api.v1.endpoints import marcas
-from api.v1.endpoints import detalles
+
+from api.v1.endpoints import detalles, eventos, marcas, sistema
 
 api_router = APIRouter()
 api_router.include_router(marcas.router, prefix="")
-api_router.include_router(detalles.router, prefix="")
\ No newline at end of file
+api_router.include_router(detalles.router, prefix="")
+api_router.include_router(sistema.router, prefix="")
+api_router.include_router(eventos.router, prefix="")
@@ -1,12 +1,303 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import asyncio
+import itertools
+import time
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
 from core.config import settings
-from typing import AsyncGenerator
 
-engine = create_async_engine(settings.database_url, echo=False, pool_pre_ping=True,
-    connect_args={"ssl": True},)
-AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """QueuePool que además mide cuánto espera cada checkout por una conexión libre."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "max_overflow": self._max_overflow,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_total_ms": round(self.wait_total * 1000, 3),
+            "wait_avg_ms": round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+def build_engine(url: str, **overrides: Any) -> AsyncEngine:
+    """Engine async con la configuración de pool/asyncpg de Settings; `overrides` pisa kwargs."""
+    url_obj = make_url(url)
+    connect_args: dict[str, Any] = {}
+    if url_obj.drivername == "postgresql+asyncpg":
+        # Caché de SQLAlchemy sobre asyncpg + la propia de asyncpg
+        url_obj = url_obj.update_query_dict(
+            {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+        )
+        connect_args["statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+        if settings.DB_SSL:
+            connect_args["ssl"] = True
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+    kwargs: dict[str, Any] = dict(
+        echo=False,
+        poolclass=InstrumentedAsyncPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+    kwargs.update(overrides)
+    return create_async_engine(url_obj, **kwargs)
+
+
+# Engine perezoso: lo crea el lifespan de main.py (o el primer uso), no el import.
+# AsyncSessionLocal existe desde el import y se enlaza al engine al crearlo.
+_engine: AsyncEngine | None = None
+
+
+class _LazySessionmaker(async_sessionmaker):
+    def __call__(self, **local_kw: Any) -> AsyncSession:
+        get_engine()
+        return super().__call__(**local_kw)
+
+
+AsyncSessionLocal = _LazySessionmaker(expire_on_commit=False, autoflush=False)
+
+
+def get_engine() -> AsyncEngine:
+    global _engine
+    if _engine is None:
+        _engine = build_engine(settings.database_url)
+        AsyncSessionLocal.configure(bind=_engine)
+    return _engine
+
+
+async def dispose_db() -> None:
+    """Cierra réplicas y pool del primario; un uso posterior vuelve a crearlos."""
+    global _engine
+    await replicas.close()
+    engine, _engine = _engine, None
+    if engine is not None:
+        await engine.dispose()
+
+
+def __getattr__(name: str) -> Any:
+    # Compatibilidad con `from bd.session import engine` (crea el engine en ese momento)
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def _pool_stats(pool: Any) -> dict[str, Any]:
+    if isinstance(pool, InstrumentedAsyncPool):
+        return pool.stats()
+    return {"status": pool.status()}
+
+
+def pool_stats() -> dict[str, Any]:
+    if _engine is None:
+        return {"status": "sin inicializar"}
+    return _pool_stats(_engine.pool)
+
+
+# ---------------------------------------------------------------------------
+# Réplicas de lectura
+# ---------------------------------------------------------------------------
+
+# Errores que indican réplica caída (no errores de la consulta en sí)
+REPLICA_DOWN_ERRORS = (DBAPIError, OSError, asyncio.TimeoutError)
+
+# NULL en un primario o en una réplica sin nada replicado aún
+LAG_SQL = text(
+    "SELECT CASE WHEN pg_is_in_recovery() "
+    "THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class Replica:
+    def __init__(self, index: int, url: str) -> None:
+        self.name = f"replica{index}"
+        self.engine = build_engine(url)
+        # info["replica"] marca las sesiones de réplica (ver primary_session)
+        self.sessionmaker = async_sessionmaker(
+            self.engine, expire_on_commit=False, autoflush=False, info={"replica": self.name}
+        )
+        self.healthy = True
+        self.lag: float | None = None
+        self.last_error: str | None = None
+        self.failures = 0
+
+    def mark_down(self, reason: str) -> None:
+        if self.healthy:
+            logger.warning("Réplica {} fuera de rotación: {}", self.name, reason)
+        self.healthy = False
+        self.last_error = reason
+        self.failures += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "pool": _pool_stats(self.engine.pool),
+        }
+
+
+class ReplicaSet:
+    """
+    Réplicas en round-robin entre las sanas. Una réplica sale de rotación si no
+    conecta o su retraso supera REPLICA_MAX_LAG_SECONDS; un chequeo periódico
+    (arranca con la primera lectura) la vuelve a meter cuando se recupera.
+    Sin réplicas sanas las lecturas van al primario.
+    """
+
+    def __init__(self, urls: list[str]) -> None:
+        self.urls = urls
+        self._replicas: list[Replica] | None = None
+        self._rr = itertools.count()
+        self._health_task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+
+    @property
+    def replicas(self) -> list[Replica]:
+        # Engines creados en el primer uso, como el del primario
+        if self._replicas is None:
+            self._replicas = [Replica(i, url) for i, url in enumerate(self.urls)]
+        return self._replicas
+
+    def pick(self) -> Replica | None:
+        if not self.enabled:
+            return None
+        self._ensure_health_task()
+        healthy = [r for r in self.replicas if r.healthy]
+        return healthy[next(self._rr) % len(healthy)] if healthy else None
+
+    def _ensure_health_task(self) -> None:
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self.check(r) for r in self.replicas))
+            await asyncio.sleep(settings.REPLICA_HEALTH_INTERVAL_SECONDS)
+
+    async def check(self, replica: Replica) -> None:
+        async def lag_seconds() -> Any:
+            async with replica.engine.connect() as conn:
+                return await conn.scalar(LAG_SQL)
+
+        try:
+            lag = await asyncio.wait_for(lag_seconds(), settings.REPLICA_HEALTH_TIMEOUT_SECONDS)
+        except Exception as e:
+            replica.mark_down(repr(e))
+            return
+        replica.lag = float(lag) if lag is not None else None
+        max_lag = settings.REPLICA_MAX_LAG_SECONDS
+        if max_lag and replica.lag is not None and replica.lag > max_lag:
+            replica.mark_down(f"retraso {replica.lag:.1f}s > {max_lag:g}s")
+        elif not replica.healthy:
+            logger.info("Réplica {} de vuelta en rotación", replica.name)
+            replica.healthy = True
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [r.stats() for r in self.replicas]
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        replicas_, self._replicas = self._replicas, None
+        for replica in replicas_ or []:
+            await replica.engine.dispose()
+
+
+replicas = ReplicaSet(settings.replica_urls)
+
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Sesión de solo lectura: una réplica sana, o el primario si no hay ninguna.
+    La conexión se abre aquí para poder caer al primario antes de que el
+    endpoint empiece (con pre_ping, una réplica caída se detecta en el checkout).
+    """
+    replica = replicas.pick()
+    if replica is not None:
+        session = replica.sessionmaker()
+        try:
+            await session.connection()
+        except REPLICA_DOWN_ERRORS as e:
+            await session.close()
+            replica.mark_down(repr(e))
+        else:
+            async with session:
+                yield session
+            return
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def read_sessionmaker() -> async_sessionmaker:
+    """Factoría para lecturas largas fuera de una dependencia (p. ej. export en streaming)."""
+    replica = replicas.pick()
+    return replica.sessionmaker if replica is not None else AsyncSessionLocal
+
+
+@asynccontextmanager
+async def primary_session(db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    `db`, o una sesión del primario si `db` es de réplica. Para rellenar cachés
+    compartidas: lo leído de una réplica con retraso quedaría en la caché para
+    todos (también para quien acaba de escribir) hasta el TTL o el próximo invalidate.
+    """
+    if "replica" not in db.info:
+        yield db
+        return
+    async with AsyncSessionLocal() as session:
+        yield session
@@ -0,0 +1,62 @@
+# app/bd/warmup.py
+"""
+Warm-up opcional del pool al arrancar (DB_POOL_WARMUP > 0): abre N conexiones
+a la vez y, con DB_WARMUP_PREPARE, ejecuta en cada una las consultas calientes
+para que la caché de compilación de SQLAlchemy y las sentencias preparadas de
+asyncpg (por conexión) estén listas antes de la primera petición.
+"""
+import asyncio
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from core.config import settings
+from repositories.marca_repository import MarcaRepository
+from services.metrics_service import MetricsService
+
+
+async def _prepare(conn: AsyncConnection) -> None:
+    # Mismas formas de consulta que las rutas de lectura (los valores dan igual: van como parámetros)
+    repo = MarcaRepository()
+    async with AsyncSession(bind=conn, expire_on_commit=False, autoflush=False) as db:
+        await repo.list_rows(db, limit=51)
+        await repo.get(db, 0)
+        if settings.LIST_ETAG_ENABLED:
+            await repo.collection_version(db, summary=settings.STATS_SUMMARY_ENABLED)
+        await MetricsService().compute_stats(db)
+        await db.rollback()
+
+
+async def _warm_connection(engine: AsyncEngine, barrier: asyncio.Barrier) -> None:
+    try:
+        async with engine.connect() as conn:
+            if settings.DB_WARMUP_PREPARE:
+                await _prepare(conn)
+            # No se devuelve al pool hasta que estén todas abiertas: si no, se reutilizaría la misma
+            await barrier.wait()
+    except BaseException:
+        await barrier.abort()
+        raise
+
+
+async def warm_up(engines: list[AsyncEngine], connections: int) -> None:
+    """Nunca impide arrancar: un fallo solo se registra."""
+    connections = min(connections, settings.DB_POOL_SIZE)
+    if connections <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    for engine in engines:
+        start = loop.time()
+        barrier = asyncio.Barrier(connections)
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(_warm_connection(engine, barrier) for _ in range(connections))),
+                settings.DB_WARMUP_TIMEOUT_SECONDS,
+            )
+        except Exception as e:
+            logger.warning("Warm-up del pool ({}) incompleto: {!r}", engine.url.host, e)
+            continue
+        logger.info(
+            "Pool {} precalentado: {} conexiones en {:.0f} ms",
+            engine.url.host, connections, (loop.time() - start) * 1000,
+        )
@@ -0,0 +1,76 @@
+# benchmarks/bench_detalles.py
+"""
+Compara GET /detalles: ruta secuencial (5 queries), agregada sobre marcas
+(1 query, un scan) y leyendo marca_stats (1 query, O(1); requiere migración 0003).
+
+Uso (desde backend/):
+    python -m benchmarks.bench_detalles --url postgresql+asyncpg://u:p@localhost/db --iterations 50
+"""
+import argparse
+import asyncio
+import json
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bd.session import build_engine
+from benchmarks.common import QueryCounter, Timer, summarize
+from repositories.metrics_repository import MetricsRepository
+from services.metrics_service import MetricsService
+
+
+async def legacy_stats(repo: MetricsRepository, service: MetricsService, db) -> None:
+    # Implementación anterior: una query por contador
+    await repo.total_marcas(db)
+    await repo.count_pendientes(db)
+    await repo.count_vencimientos(db)
+    start_m, next_m = service._month_bounds_utc()
+    await repo.count_aprobadas_este_mes(db, start_month=start_m, next_month=next_m)
+    await repo.last_n_marcas(db, n=3)
+
+
+async def run(url: str, iterations: int, warmup: int) -> dict:
+    engine = build_engine(url, pool_size=1)
+    Session = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    repo = MetricsRepository()
+    service = MetricsService(repo)
+    counter = QueryCounter(engine)
+    start_m, next_m = service._month_bounds_utc()
+
+    variants = {
+        "legacy_sequential": lambda db: legacy_stats(repo, service, db),
+        # Directo al repositorio, sin la caché de MetricsService
+        "aggregated_scan": lambda db: repo.stats_and_last_n(db, start_month=start_m, next_month=next_m),
+        "summary_table": lambda db: repo.summary_stats_and_last_n(db, month_key=start_m.strftime("%Y-%m")),
+    }
+    report = {}
+    try:
+        for name, fn in variants.items():
+            timer = Timer()
+            async with Session() as db:
+                for _ in range(warmup):
+                    await fn(db)
+                with counter.track():
+                    for _ in range(iterations):
+                        with timer.measure():
+                            await fn(db)
+            report[name] = {
+                "queries_per_call": counter.count / iterations,
+                **summarize(timer.samples_ms),
+            }
+    finally:
+        await engine.dispose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL async de una BD local o de pruebas (obligatoria: nunca la de producción por defecto)")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    args = parser.parse_args()
+    report = asyncio.run(run(args.url, args.iterations, args.warmup))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_pool.py
+"""
+Throughput con distintos tamaños de pool (bd.session.build_engine).
+
+Para cada --sizes lanza --concurrency tareas que ejecutan --query en bucle
+durante --duration segundos, cada una con su propio checkout de conexión.
+Reporta peticiones/s, latencia y la espera media/máxima por conexión.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_pool --url postgresql+asyncpg://u:p@localhost/db --sizes 2,5,10,20 --concurrency 50
+    python -m benchmarks.bench_pool --url postgresql+asyncpg://u:p@localhost/db --query "SELECT pg_sleep(0.005)"
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import text
+
+from bd.session import build_engine
+from benchmarks.common import Timer, summarize
+
+
+async def run_size(url: str, size: int, concurrency: int, duration: float, query: str) -> dict:
+    engine = build_engine(url, pool_size=size, max_overflow=0)
+    timer = Timer()
+    stmt = text(query)
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            with timer.measure():
+                async with engine.connect() as conn:
+                    await conn.execute(stmt)
+
+    try:
+        # Calentamiento: abrir las conexiones antes de medir
+        async with engine.connect() as conn:
+            await conn.execute(stmt)
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        pool_stats = engine.pool.stats()
+    finally:
+        await engine.dispose()
+    return {
+        "pool_size": size,
+        "concurrency": concurrency,
+        "requests": len(timer.samples_ms),
+        "rps": round(len(timer.samples_ms) / elapsed, 1),
+        **summarize(timer.samples_ms),
+        "wait_avg_ms": pool_stats["wait_avg_ms"],
+        "wait_max_ms": pool_stats["wait_max_ms"],
+    }
+
+
+async def run(args: argparse.Namespace) -> list:
+    sizes = [int(s) for s in args.sizes.split(",")]
+    return [
+        await run_size(args.url, size, args.concurrency, args.duration, args.query) for size in sizes
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL async de una BD local o de pruebas (obligatoria: nunca la de producción por defecto)")
+    parser.add_argument("--sizes", default="1,2,5,10,20")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--query", default="SELECT 1")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# benchmarks/bench_search.py
+"""
+Latencia de búsqueda en marcas antes/después de los índices GIN de trigramas.
+
+Crea una tabla desechable `marcas_bench` con la misma forma que `marcas`,
+la llena con --rows filas (por defecto 1M, generadas en el servidor),
+mide la búsqueda sin índices, crea los índices de 0002_marcas_search_trgm
+y vuelve a medir. Requiere permisos para CREATE EXTENSION pg_trgm.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_search --url postgresql+asyncpg://u:p@localhost/db
+"""
+import argparse
+import asyncio
+import json
+
+from sqlalchemy import text
+
+from bd.session import build_engine
+from benchmarks.common import Timer, summarize
+
+TABLE = "marcas_bench"
+
+DDL = f"""
+CREATE TABLE {TABLE} (
+    id SERIAL PRIMARY KEY,
+    titulo VARCHAR(255) NOT NULL,
+    nombre VARCHAR(255) NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    approved_at TIMESTAMPTZ
+)
+"""
+
+SEED = f"""
+INSERT INTO {TABLE} (titulo, nombre, estado)
+SELECT 'Marca ' || md5(i::text),
+       'Empresa ' || substr(md5((i * 7)::text), 1, 16),
+       (ARRAY['ACTIVA', 'INACTIVA', 'SUSPENDIDA'])[1 + i % 3]
+FROM generate_series(1, :rows) AS i
+"""
+
+INDEXES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX {TABLE}_titulo_trgm ON {TABLE} USING gin (titulo gin_trgm_ops)",
+    f"CREATE INDEX {TABLE}_nombre_trgm ON {TABLE} USING gin (nombre gin_trgm_ops)",
+]
+
+# Misma forma que MarcaRepository.list
+QUERIES = {
+    "contains": f"""
+        SELECT id, titulo, nombre, estado FROM {TABLE}
+        WHERE titulo ILIKE '%' || :q || '%' OR nombre ILIKE '%' || :q || '%'
+        ORDER BY id LIMIT 50
+    """,
+    "prefix": f"""
+        SELECT id, titulo, nombre, estado FROM {TABLE}
+        WHERE titulo ILIKE :q || '%' OR nombre ILIKE :q || '%'
+        ORDER BY id LIMIT 50
+    """,
+    "ranked": f"""
+        SELECT id, titulo, nombre, estado FROM {TABLE}
+        WHERE titulo ILIKE '%' || :q || '%' OR nombre ILIKE '%' || :q || '%'
+        ORDER BY greatest(similarity(titulo, :q), similarity(nombre, :q)) DESC, id LIMIT 50
+    """,
+}
+
+
+async def measure(conn, terms: dict, iterations: int) -> dict:
+    out = {}
+    for name, sql in QUERIES.items():
+        timer = Timer()
+        for _ in range(iterations):
+            for q in terms[name]:
+                with timer.measure():
+                    (await conn.execute(text(sql), {"q": q})).all()
+        plan = (await conn.execute(text("EXPLAIN " + sql), {"q": terms[name][0]})).scalars().all()
+        out[name] = {**summarize(timer.samples_ms), "plan": [line.strip() for line in plan[:4]]}
+    return out
+
+
+async def run(url: str, rows: int, iterations: int, keep: bool) -> dict:
+    engine = build_engine(url)
+    report: dict = {"rows": rows}
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+            await conn.execute(text(DDL))
+            await conn.execute(text(SEED), {"rows": rows})
+            await conn.execute(text(f"ANALYZE {TABLE}"))
+            await conn.commit()
+
+            sample = (
+                await conn.execute(text(f"SELECT titulo FROM {TABLE} ORDER BY random() LIMIT 5"))
+            ).scalars().all()
+            fragments = [t[12:20] for t in sample]
+            terms = {
+                "contains": fragments,
+                "prefix": [t[:14] for t in sample],
+                "ranked": fragments,
+            }
+
+            report["before"] = await measure(conn, terms, iterations)
+            for ddl in INDEXES:
+                await conn.execute(text(ddl))
+            await conn.execute(text(f"ANALYZE {TABLE}"))
+            await conn.commit()
+            report["after"] = await measure(conn, terms, iterations)
+
+            if not keep:
+                await conn.execute(text(f"DROP TABLE {TABLE}"))
+                await conn.commit()
+    finally:
+        await engine.dispose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL async de una BD local o de pruebas (obligatoria: nunca la de producción por defecto)")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="No borrar marcas_bench al terminar")
+    args = parser.parse_args()
+    report = asyncio.run(run(args.url, args.rows, args.iterations, args.keep))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
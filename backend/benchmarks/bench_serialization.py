@@ -0,0 +1,63 @@
+# benchmarks/bench_serialization.py
+"""
+Micro-benchmark de serialización de una página de GET /marcas/ (sin BD).
+
+- orm_double_validation: ruta anterior. Instancias ORM -> schemas.Marca.model_validate
+  por fila -> revalidación contra response_model -> JSON.
+- rows_orjson: ruta actual. Filas (tuplas con nombre) -> dict -> orjson.dumps.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_serialization --rows 200 --repeat 2000
+"""
+import argparse
+import json
+import timeit
+from collections import namedtuple
+
+import orjson
+from pydantic import TypeAdapter
+
+from models.index import Marca
+from schemas import Marca as schemas
+
+MarcaRow = namedtuple("MarcaRow", ["nombre", "titulo", "estado", "id"])
+ESTADOS = ("ACTIVA", "INACTIVA", "SUSPENDIDA")
+
+
+def make_rows(n: int) -> list[MarcaRow]:
+    return [MarcaRow(f"Empresa {i}", f"Marca número {i}", ESTADOS[i % 3], i) for i in range(1, n + 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    response_adapter = TypeAdapter(list[schemas.Marca])
+
+    def orm_double_validation() -> bytes:
+        # Hidratar ORM (aquí sin sesión; con sesión cuesta más), validar y revalidar
+        marcas = [Marca(id=r.id, nombre=r.nombre, titulo=r.titulo, estado=r.estado) for r in rows]
+        validated = [schemas.Marca.model_validate(m) for m in marcas]
+        revalidated = response_adapter.validate_python(validated, from_attributes=True)
+        return json.dumps(response_adapter.dump_python(revalidated, mode="json")).encode()
+
+    def rows_orjson() -> bytes:
+        return orjson.dumps([r._asdict() for r in rows])
+
+    assert orjson.loads(orm_double_validation()) == orjson.loads(rows_orjson())
+
+    report = {"rows": args.rows}
+    for name, fn in (("orm_double_validation", orm_double_validation), ("rows_orjson", rows_orjson)):
+        best = min(timeit.repeat(fn, number=args.repeat, repeat=5)) / args.repeat
+        report[name] = {"us_per_page": round(best * 1e6, 1)}
+    report["speedup"] = round(
+        report["orm_double_validation"]["us_per_page"] / report["rows_orjson"]["us_per_page"], 1
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
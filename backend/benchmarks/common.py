@@ -0,0 +1,61 @@
+# benchmarks/common.py
+"""Utilidades compartidas por los benchmarks (ejecutar desde backend/)."""
+import statistics
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class QueryCounter:
+    """Cuenta las sentencias que llegan al driver (un round trip cada una)."""
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+    @contextmanager
+    def track(self) -> Iterator["QueryCounter"]:
+        self.count = 0
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self._on_execute)
+        try:
+            yield self
+        finally:
+            event.remove(self.engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+
+class Timer:
+    def __init__(self) -> None:
+        self.samples_ms: list[float] = []
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples_ms.append((time.perf_counter() - start) * 1000)
+
+
+def summarize(samples_ms: list[float]) -> dict[str, float]:
+    if not samples_ms:
+        return {"n": 0}
+    ordered = sorted(samples_ms)
+
+    def pct(p: float) -> float:
+        idx = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return round(ordered[idx], 3)
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(ordered[-1], 3),
+    }
@@ -0,0 +1,139 @@
+# benchmarks/startup.py
+"""
+Perfil de arranque en frío: lo que paga cada contenedor nuevo antes de servir.
+
+Cada medición es un proceso Python nuevo (sin cachés en memoria) que mide:
+  - import_ms:         `import main` (módulos, routers, Settings)
+  - lifespan_ms:       arranque del lifespan (engines, instrumentación, warm-up si está activo)
+  - first_request_ms:  primera petición a /health por ASGI en proceso
+  - engine_at_import:  si importar main creó ya el engine (debe ser false)
+
+Con --importtime añade los módulos que más tardan en importarse (python -X importtime).
+Con --budget-ms sale con código 1 si la mediana de import_ms lo supera (para CI).
+No abre conexiones a la BD salvo que se active DB_POOL_WARMUP en el entorno.
+
+Uso (desde backend/):
+    python -m benchmarks.startup --runs 5 --importtime --top 15
+    python -m benchmarks.startup --runs 5 --budget-ms 1500 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Se ejecuta en un proceso nuevo por medición
+PROBE = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+import bd.session
+engine_at_import = bd.session._engine is not None
+
+async def boot():
+    import httpx
+    s0 = time.perf_counter()
+    async with main.app.router.lifespan_context(main.app):
+        s1 = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            res = await client.get("/health")
+        s2 = time.perf_counter()
+    return (s1 - s0) * 1000, (s2 - s1) * 1000, res.status_code
+
+lifespan_ms, first_ms, status = asyncio.run(boot())
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "lifespan_ms": lifespan_ms,
+    "first_request_ms": first_ms,
+    "status": status,
+    "engine_at_import": engine_at_import,
+}))
+"""
+
+
+def probe_env() -> dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("DB_SSL", "false")
+    return env
+
+
+def run_probe() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], capture_output=True, text=True, env=probe_env(), check=False
+    )
+    if out.returncode != 0:
+        raise SystemExit(f"La medición falló:\n{out.stderr[-4000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def import_profile(top: int) -> list[dict]:
+    """Módulos de primer nivel por tiempo acumulado según `python -X importtime`."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, env=probe_env(), check=False,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Formato "| paquete" en primer nivel; los submódulos van más indentados
+        if name.startswith("  "):
+            continue
+        rows.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    return {
+        "median": round(statistics.median(samples), 1),
+        "min": round(min(samples), 1),
+        "max": round(max(samples), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="Incluir los imports más lentos")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None, help="Máximo para la mediana de import_ms")
+    parser.add_argument("--output", default=None, help="Guardar el JSON en este fichero")
+    args = parser.parse_args()
+
+    probes = [run_probe() for _ in range(args.runs)]
+    report: dict = {
+        "runs": args.runs,
+        "python": sys.version.split()[0],
+        "engine_at_import": any(p["engine_at_import"] for p in probes),
+        **{key: summarize([p[key] for p in probes]) for key in ("import_ms", "lifespan_ms", "first_request_ms")},
+    }
+    if args.importtime:
+        report["slowest_imports"] = import_profile(args.top)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+
+    failures = []
+    if report["engine_at_import"]:
+        failures.append("importar main creó el engine (debe crearse en el lifespan)")
+    if args.budget_ms is not None and report["import_ms"]["median"] > args.budget_ms:
+        failures.append(f"import_ms {report['import_ms']['median']} > presupuesto {args.budget_ms}")
+    for failure in failures:
+        print(f"FALLO: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
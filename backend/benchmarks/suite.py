@@ -0,0 +1,249 @@
+# benchmarks/suite.py
+"""
+Suite de carga reproducible de la API, en proceso (httpx + ASGITransport).
+
+Levanta la app de main.py contra la BD indicada, la siembra con --rows marcas
+(1k a 10M) y lanza una mezcla de tráfico list/search/get/patch/detalles con
+--concurrency clientes durante --duration segundos. Emite JSON con p50/p95/p99
+y peticiones/s por operación y en total.
+
+BD:
+  - Postgres local (recomendado, cifras realistas): aplicar antes `alembic upgrade head`.
+  - SQLite (stand-in sin servidor, requiere aiosqlite): mide la capa HTTP/ORM/serialización;
+    sin trigramas ni marca_stats, así que búsquedas y /detalles no son representativas.
+
+Uso (desde backend/):
+    python -m benchmarks.suite --db-url sqlite+aiosqlite:///./bench.sqlite3 --rows 10000 --output base.json
+    python -m benchmarks.suite --db-url postgresql+asyncpg://u:p@localhost/bench --rows 1000000 \\
+        --mix list=40,search=20,get=25,patch=5,detalles=10 --baseline base.json --threshold 0.10
+
+Con --baseline compara contra un JSON previo y sale con código 1 si alguna
+operación empeora su p95 o sus peticiones/s más allá de --threshold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks.common import summarize
+
+SEED_BATCH = 10_000
+WORDS = ("sol", "luna", "andes", "cafe", "norte", "rio", "verde", "oro", "mar", "cielo")
+ESTADOS = ("ACTIVA", "INACTIVA", "SUSPENDIDA")
+DEFAULT_MIX = "list=40,search=20,get=25,patch=5,detalles=10"
+
+
+def parse_mix(mix: str) -> tuple[list[str], list[int]]:
+    ops, weights = [], []
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("list", "search", "get", "patch", "detalles"):
+            raise SystemExit(f"Operación desconocida en --mix: {name}")
+        ops.append(name)
+        weights.append(int(weight or 1))
+    return ops, weights
+
+
+def configure_env(args: argparse.Namespace) -> None:
+    # Settings se lee al importar main: hay que fijar el entorno antes
+    os.environ["ASYNC_DATABASE_URL"] = args.db_url
+    os.environ.setdefault("DB_SSL", "false")
+    os.environ.setdefault("DB_POOL_SIZE", str(args.pool_size))
+    os.environ.setdefault("SERVER_TIMING_ENABLED", "false")
+    # El benchmark mide la API, no el limitador: sin 429/503 por la carga que genera
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    if args.db_url.startswith("sqlite"):
+        os.environ.setdefault("STATS_SUMMARY_ENABLED", "false")
+    if args.no_cache:
+        os.environ["CACHE_TTL_SECONDS"] = "0"
+        os.environ["STATS_CACHE_TTL_SECONDS"] = "0"
+
+
+async def seed(engine, rows: int, reseed: bool) -> int:
+    from sqlalchemy import delete, func, insert, select, text
+
+    from bd.base import Base
+    from models.index import Marca
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with engine.begin() as conn:
+        current = (await conn.execute(select(func.count()).select_from(Marca))).scalar_one()
+        if current == rows and not reseed:
+            return current
+        if engine.dialect.name == "postgresql":
+            # TRUNCATE no dispara los triggers de marca_stats: se vacía también
+            await conn.execute(text("TRUNCATE marcas, marca_stats RESTART IDENTITY"))
+            words = "ARRAY[" + ", ".join(f"'{w}'" for w in WORDS) + "]"
+            # Generado en el servidor: 10M filas sin pasar por Python
+            await conn.execute(text(f"""
+                INSERT INTO marcas (titulo, nombre, estado, approved_at)
+                SELECT 'Marca ' || lpad(i::text, 8, '0') || ' ' || ({words})[1 + i % 10],
+                       'Empresa ' || ({words})[1 + (i / 10) % 10] || ' ' || i,
+                       (ARRAY['ACTIVA', 'INACTIVA', 'SUSPENDIDA'])[1 + i % 3],
+                       CASE WHEN i % 3 = 0 THEN now() - (i % 60) * interval '1 day' END
+                FROM generate_series(1, :rows) AS i
+            """), {"rows": rows})
+            await conn.execute(text("ANALYZE marcas"))
+        else:
+            await conn.execute(delete(Marca))
+            for start in range(1, rows + 1, SEED_BATCH):
+                batch = [
+                    {
+                        "titulo": f"Marca {i:08d} {WORDS[i % 10]}",
+                        "nombre": f"Empresa {WORDS[(i // 10) % 10]} {i}",
+                        "estado": ESTADOS[i % 3],
+                    }
+                    for i in range(start, min(rows, start + SEED_BATCH - 1) + 1)
+                ]
+                await conn.execute(insert(Marca), batch)
+    return rows
+
+
+async def drive(app, args: argparse.Namespace, id_range: tuple[int, int]) -> dict:
+    import httpx
+
+    ops, weights = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    low, high = id_range
+    prefix = "/api/v1"
+    samples: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+
+    def request_for(op: str):
+        if op == "list":
+            return "GET", f"{prefix}/marcas/", {"limit": 50, "offset": rng.randrange(0, 2000)}, None
+        if op == "search":
+            return "GET", f"{prefix}/marcas/", {"search": rng.choice(WORDS), "limit": 20}, None
+        if op == "get":
+            return "GET", f"{prefix}/marcas/{rng.randint(low, high)}", None, None
+        if op == "patch":
+            return "PATCH", f"{prefix}/marcas/{rng.randint(low, high)}", None, {"estado": rng.choice(ESTADOS)}
+        return "GET", f"{prefix}/detalles", None, None
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker(deadline: float, record: bool) -> None:
+            while time.perf_counter() < deadline:
+                op = rng.choices(ops, weights)[0]
+                method, url, params, body = request_for(op)
+                start = time.perf_counter()
+                resp = await client.request(method, url, params=params, json=body)
+                elapsed = (time.perf_counter() - start) * 1000
+                if not record:
+                    continue
+                samples[op].append(elapsed)
+                if resp.status_code >= 500:
+                    errors[op] += 1
+
+        if args.warmup:
+            deadline = time.perf_counter() + args.warmup
+            await asyncio.gather(*(worker(deadline, False) for _ in range(args.concurrency)))
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker(deadline, True) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    all_samples = [s for op_samples in samples.values() for s in op_samples]
+    return {
+        "overall": {
+            "rps": round(len(all_samples) / elapsed, 1),
+            "errors": sum(errors.values()),
+            **summarize(all_samples),
+        },
+        "ops": {
+            op: {
+                "rps": round(len(op_samples) / elapsed, 1),
+                "errors": errors[op],
+                **summarize(op_samples),
+            }
+            for op, op_samples in sorted(samples.items())
+        },
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    sections = {"overall": (current["overall"], baseline.get("overall", {}))}
+    for op, stats in current["ops"].items():
+        sections[op] = (stats, baseline.get("ops", {}).get(op, {}))
+    for name, (now, before) in sections.items():
+        if not before:
+            continue
+        if before.get("p95_ms") and now.get("p95_ms", 0) > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if before.get("rps") and now.get("rps", 0) < before["rps"] * (1 - threshold):
+            regressions.append(f"{name}: rps {before['rps']} -> {now['rps']}")
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> dict:
+    configure_env(args)
+    from sqlalchemy import func, select
+
+    from bd.session import get_engine
+    from main import app
+    from models.index import Marca
+
+    engine = get_engine()
+    await seed(engine, args.rows, args.reseed)
+    async with engine.connect() as conn:
+        low, high = (await conn.execute(select(func.min(Marca.id), func.max(Marca.id)))).one()
+    async with app.router.lifespan_context(app):
+        result = await drive(app, args, (low or 1, high or 1))
+    return {
+        "meta": {
+            "dialect": engine.dialect.name,
+            "rows": args.rows,
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "seed": args.seed,
+            "cache": not args.no_cache,
+            "python": platform.python_version(),
+        },
+        **result,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default="sqlite+aiosqlite:///./bench.sqlite3")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--reseed", action="store_true", help="Vaciar y volver a sembrar marcas")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1234, help="Semilla de la mezcla de tráfico")
+    parser.add_argument("--no-cache", action="store_true", help="Desactivar la caché de la app")
+    parser.add_argument("--output", help="Guardar el JSON en este fichero")
+    parser.add_argument("--baseline", help="JSON previo con el que comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Tolerancia relativa (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "regressions": regressions}
+        exit_code = 1 if regressions else 0
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
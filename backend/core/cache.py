@@ -0,0 +1,357 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+import orjson
+from loguru import logger
+from pydantic import BaseModel
+
+from core.cache_backend import CacheBackend, MemoryBackend, RedisBackend, RespError
+from core.config import settings
+from schemas.Marca import Marca as MarcaSchema
+
+
+def _consume_exception(fut: asyncio.Future) -> None:
+    # Evita "Future exception was never retrieved" cuando nadie esperaba la carga
+    if not fut.cancelled():
+        fut.exception()
+
+
+class TTLCache:
+    """
+    Caché en proceso acotada (LRU) con expiración por TTL.
+
+    `get_or_load` agrupa las cargas concurrentes de una misma clave: ante una
+    estampida en frío solo el primero ejecuta el loader y el resto espera su
+    resultado. Los valores None no se guardan. `store`, si se pasa, recibe el
+    valor solo cuando también se guarda aquí (no hubo invalidate durante la carga).
+    """
+
+    def __init__(self, *, maxsize: int, ttl: float, name: str = "cache") -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        store: Callable[[Any], Awaitable[None]] | None = None,
+    ) -> Any:
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        pending = self._inflight.get(key)
+        while pending is not None:
+            self.coalesced += 1
+            try:
+                # shield: si este waiter se cancela no cancela la carga compartida
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not pending.cancelled() or (task is not None and task.cancelling()):
+                    raise
+            # Se canceló la petición que cargaba, no esta: otro intento
+            pending = self._inflight.get(key)
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        fut.add_done_callback(_consume_exception)
+        self._inflight[key] = fut
+        try:
+            value = await loader()
+        except BaseException as exc:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+            if isinstance(exc, Exception):
+                fut.set_exception(exc)
+            else:
+                fut.cancel()
+            raise
+        # Si hubo un invalidate mientras cargábamos, el valor ya puede estar viejo: no se guarda
+        current = self._inflight.get(key) is fut
+        if current:
+            del self._inflight[key]
+            if value is not None:
+                self.set(key, value)
+        fut.set_result(value)
+        if current and value is not None and store is not None:
+            await store(value)
+        return value
+
+    def invalidate(self, *keys: Hashable) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+            self._inflight.pop(key, None)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._inflight.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Caché compartida entre workers
+# ---------------------------------------------------------------------------
+
+# Identifica a este proceso en los mensajes de invalidación
+ORIGIN = uuid.uuid4().hex
+INVALIDATION_CHANNEL = f"{settings.CACHE_KEY_PREFIX}:invalidate"
+
+_backend: CacheBackend | None = None
+
+
+def get_backend() -> CacheBackend:
+    global _backend
+    if _backend is None:
+        if settings.CACHE_BACKEND == "redis":
+            _backend = RedisBackend(settings.CACHE_REDIS_URL, timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS)
+        else:
+            _backend = MemoryBackend(maxsize=settings.CACHE_MAXSIZE)
+    return _backend
+
+
+async def close_backend() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+class SharedCache:
+    """
+    Caché de dos niveles: L1 en proceso (TTLCache, agrupa cargas) + backend compartido.
+
+    Claves versionadas `{prefix}:{name}:v{version}:{key}`: subir CACHE_KEY_VERSION
+    descarta lo escrito con otro formato. Los valores se guardan como bytes orjson
+    (`model` se serializa con model_dump y se reconstruye con model_validate).
+    `invalidate` borra del backend y avisa por pub/sub al resto de workers.
+    Si el backend falla se degrada a la BD, nunca a un error.
+
+    Cada clave tiene en el backend una generación (`{clave}:gen`) que `invalidate`
+    cambia, y cada valor va etiquetado con la generación leída antes de cargarlo
+    (`{gen}\n{orjson}`). Un valor etiquetado con otra generación no vale: lo que
+    escriba una carga que empezó antes de un invalidate (en este worker o en otro)
+    se ignora aunque llegue al backend después del borrado.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        ttl: float,
+        maxsize: int,
+        model: type[BaseModel] | None = None,
+        backend: CacheBackend | None = None,
+    ) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.model = model
+        self._backend = backend
+        # Con Redis el L1 vive poco: acota la ventana si se pierde una invalidación
+        l1_ttl = ttl if settings.CACHE_BACKEND != "redis" else min(ttl, settings.CACHE_L1_TTL_SECONDS)
+        self.l1 = TTLCache(maxsize=maxsize, ttl=l1_ttl, name=name)
+        # Las invalidaciones propias ya se aplicaron al L1: el mensaje de vuelta se ignora
+        self.origin = f"{ORIGIN}:{uuid.uuid4().hex[:8]}"
+        self._subscribed = False
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.stale_discarded = 0
+        self.backend_errors = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_backend()
+
+    def key(self, key: Hashable) -> str:
+        return f"{settings.CACHE_KEY_PREFIX}:{self.name}:v{settings.CACHE_KEY_VERSION}:{key}"
+
+    def gen_key(self, key: Hashable) -> str:
+        return f"{self.key(key)}:gen"
+
+    @property
+    def gen_ttl(self) -> float:
+        # Más que cualquier valor etiquetado con la generación anterior: si caducara
+        # antes, un valor viejo sin generación volvería a ser válido
+        return self.ttl * 2 + 60
+
+    def encode(self, value: Any, gen: bytes = b"") -> bytes:
+        return gen + b"\n" + orjson.dumps(value.model_dump() if self.model else value)
+
+    def decode(self, raw: bytes) -> Any:
+        data = orjson.loads(raw)
+        return self.model.model_validate(data) if self.model else data
+
+    def _read_tagged(self, raw: bytes | None, gen: bytes | None) -> Any | None:
+        # Valor si está etiquetado con la generación vigente; None si falta o es viejo
+        if raw is None:
+            return None
+        tag, _, payload = raw.partition(b"\n")
+        if tag != (gen or b""):
+            self.stale_discarded += 1
+            return None
+        return self.decode(payload)
+
+    async def _mget(self, keys: list[Hashable]) -> list[tuple[bytes | None, bytes | None]]:
+        # (valor, generación) de cada clave en un solo round trip
+        names = [name for k in keys for name in (self.key(k), self.gen_key(k))]
+        raws = await self._backend_call("mget", *names) or [None] * len(names)
+        return list(zip(raws[0::2], raws[1::2], strict=True))
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        await self._ensure_subscribed()
+        gen: bytes | None = None
+        loaded = False
+
+        async def load_shared() -> Any:
+            nonlocal gen, loaded
+            ((raw, gen),) = await self._mget([key])
+            value = self._read_tagged(raw, gen)
+            if value is not None:
+                self.l2_hits += 1
+                return value
+            self.l2_misses += 1
+            loaded = True
+            return await loader()
+
+        async def store_shared(value: Any) -> None:
+            # Solo lo cargado de la BD y solo si no hubo invalidate durante la carga
+            # (TTLCache lo comprueba); la etiqueta cubre los de otros workers
+            if loaded:
+                await self._backend_call("set", self.key(key), self.encode(value, gen or b""), self.ttl)
+
+        return await self.l1.get_or_load(key, load_shared, store_shared)
+
+    async def invalidate(self, *keys: Hashable) -> None:
+        if not keys:
+            return
+        self.l1.invalidate(*keys)
+        # Primero la generación nueva (invalida lo que esté en vuelo), luego el borrado
+        gen = uuid.uuid4().hex[:12].encode()
+        await asyncio.gather(*(self._backend_call("set", self.gen_key(k), gen, self.gen_ttl) for k in keys))
+        await self._backend_call("delete", *(self.key(k) for k in keys))
+        message = orjson.dumps({"cache": self.name, "keys": list(keys), "origin": self.origin})
+        await self._backend_call("publish", INVALIDATION_CHANNEL, message)
+
+    async def get_many(self, keys: list[Hashable]) -> dict[Hashable, Any]:
+        """Valores presentes (L1 y luego backend); sin cargar los que falten."""
+        found: dict[Hashable, Any] = {}
+        missing: list[Hashable] = []
+        for key in keys:
+            value = self.l1.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            await self._ensure_subscribed()
+            for key, (raw, gen) in zip(missing, await self._mget(missing), strict=True):
+                value = self._read_tagged(raw, gen)
+                if value is not None:
+                    found[key] = value
+                    self.l1.set(key, value)
+        return found
+
+    async def set_many(self, items: dict[Hashable, Any]) -> None:
+        keys = list(items)
+        for key in keys:
+            self.l1.set(key, items[key])
+        gens = [gen for _, gen in await self._mget(keys)]
+        await asyncio.gather(
+            *(
+                self._backend_call("set", self.key(k), self.encode(items[k], gen or b""), self.ttl)
+                for k, gen in zip(keys, gens, strict=True)
+            )
+        )
+
+    async def _ensure_subscribed(self) -> None:
+        if self._subscribed:
+            return
+        self._subscribed = True
+        await self.backend.subscribe(INVALIDATION_CHANNEL, self._on_message, self.l1.clear)
+
+    def _on_message(self, raw: bytes) -> None:
+        try:
+            message = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            return
+        if message.get("origin") == self.origin or message.get("cache") != self.name:
+            return
+        self.l1.invalidate(*message.get("keys", []))
+
+    async def _backend_call(self, method: str, *args: Any) -> Any:
+        try:
+            return await getattr(self.backend, method)(*args)
+        except (ConnectionError, RespError) as e:
+            self.backend_errors += 1
+            logger.warning("Caché {}: backend no disponible en {} ({!r})", self.name, method, e)
+            return None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self.l1.stats(),
+            "backend": type(self.backend).__name__,
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+            "stale_discarded": self.stale_discarded,
+            "backend_errors": self.backend_errors,
+        }
+
+
+# Instancias compartidas por MarcaService y MetricsService
+STATS_KEY = "detalles"
+marca_cache = SharedCache(
+    "marcas", ttl=settings.CACHE_TTL_SECONDS, maxsize=settings.CACHE_MAXSIZE, model=MarcaSchema
+)
+stats_cache = SharedCache("detalles", ttl=settings.STATS_CACHE_TTL_SECONDS, maxsize=16)
+# Buckets cerrados de /detalles/series; ANALYTICS_GEN_KEY los invalida todos de una vez
+ANALYTICS_GEN_KEY = "gen"
+analytics_cache = SharedCache(
+    "analitica", ttl=settings.ANALYTICS_CACHE_TTL_SECONDS, maxsize=settings.CACHE_MAXSIZE
+)
@@ -0,0 +1,381 @@
+import asyncio
+import contextlib
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+from urllib.parse import unquote, urlsplit
+
+from loguru import logger
+
+MessageHandler = Callable[[bytes], None]
+ResetHandler = Callable[[], None]
+
+
+class CacheBackend(ABC):
+    """Almacén compartido de bytes con TTL + canal pub/sub para invalidaciones."""
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None: ...
+
+    @abstractmethod
+    async def mget(self, *keys: str) -> list[bytes | None]:
+        """Varias claves en un round trip; None en las que no existen."""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    @abstractmethod
+    async def set_if_absent(self, key: str, value: bytes, ttl: float) -> bool:
+        """SET NX: False si la clave ya existía (y no se toca)."""
+
+    @abstractmethod
+    async def compare_and_set(self, key: str, expected: bytes, value: bytes, ttl: float) -> bool:
+        """Escribe `value` solo si la clave vale `expected` (atómico); False si no."""
+
+    @abstractmethod
+    async def compare_and_delete(self, key: str, expected: bytes) -> bool:
+        """Borra la clave solo si vale `expected` (atómico); False si no."""
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None: ...
+
+    @abstractmethod
+    async def publish(self, channel: str, message: bytes) -> None: ...
+
+    @abstractmethod
+    async def subscribe(
+        self, channel: str, handler: MessageHandler, on_reset: ResetHandler | None = None
+    ) -> None:
+        """`on_reset` se llama si pudieron perderse mensajes (p. ej. reconexión)."""
+
+    async def close(self) -> None:
+        return None
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Backend en proceso: mismo contrato que Redis, útil con un solo worker y en pruebas.
+    Con `maxsize=None` no desaloja por LRU (solo caduca por TTL): para datos que no
+    pueden perderse antes de tiempo, como las claves de idempotencia.
+    """
+
+    def __init__(self, maxsize: int | None = 10000) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._handlers: dict[str, list[MessageHandler]] = {}
+        self._purge_at = 1024
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry[1]
+
+    async def mget(self, *keys: str) -> list[bytes | None]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        if self.maxsize is None:
+            self._purge_expired()
+            return
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _purge_expired(self) -> None:
+        # Sin LRU lo caducado solo se borra al leerlo: barrido completo cada vez que
+        # el tamaño se duplica (coste amortizado constante por escritura)
+        if len(self._data) < self._purge_at:
+            return
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+        self._purge_at = max(1024, len(self._data) * 2)
+
+    # get/set no ceden el control al bucle: las operaciones compuestas son atómicas en el proceso
+
+    async def set_if_absent(self, key: str, value: bytes, ttl: float) -> bool:
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def compare_and_set(self, key: str, expected: bytes, value: bytes, ttl: float) -> bool:
+        if await self.get(key) != expected:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def compare_and_delete(self, key: str, expected: bytes) -> bool:
+        if await self.get(key) != expected:
+            return False
+        del self._data[key]
+        return True
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        for handler in self._handlers.get(channel, []):
+            handler(message)
+
+    async def subscribe(
+        self, channel: str, handler: MessageHandler, on_reset: ResetHandler | None = None
+    ) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+
+# ---------------------------------------------------------------------------
+# Cliente RESP2 mínimo (protocolo de Redis) sobre asyncio streams, sin dependencias
+# ---------------------------------------------------------------------------
+
+class RespError(Exception):
+    pass
+
+
+def encode_command(*args: Any) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, str):
+            data = arg.encode()
+        else:
+            data = str(arg).encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Conexión RESP cerrada")
+    prefix, body = line[:1], line[1:-2]
+    if prefix == b"+":
+        return body.decode()
+    if prefix == b"-":
+        return RespError(body.decode())
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        size = int(body)
+        if size < 0:
+            return None
+        data = await reader.readexactly(size + 2)
+        return data[:-2]
+    if prefix == b"*":
+        size = int(body)
+        if size < 0:
+            return None
+        return [await read_reply(reader) for _ in range(size)]
+    raise ConnectionError(f"Respuesta RESP inesperada: {line!r}")
+
+
+class RespConnection:
+    """Una conexión serializada por lock; se reabre sola tras un fallo."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        db: int = 0,
+        password: str | None = None,
+        timeout: float = 1.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._lock = asyncio.Lock()
+
+    async def open(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        self._reader, self._writer = reader, writer
+        if self.password:
+            await self._roundtrip("AUTH", self.password)
+        if self.db:
+            await self._roundtrip("SELECT", self.db)
+        return reader, writer
+
+    async def _roundtrip(self, *args: Any) -> Any:
+        assert self._reader is not None and self._writer is not None
+        self._writer.write(encode_command(*args))
+        await self._writer.drain()
+        reply = await asyncio.wait_for(read_reply(self._reader), self.timeout)
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    async def execute(self, *args: Any) -> Any:
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await self.open()
+                return await self._roundtrip(*args)
+            except RespError:
+                raise
+            except (TimeoutError, OSError, asyncio.IncompleteReadError) as e:
+                self._discard()
+                raise ConnectionError(f"RESP {self.host}:{self.port}: {e!r}") from e
+            except BaseException:
+                # Cancelada entre el envío y la respuesta: esa respuesta la leería la
+                # siguiente llamada (el valor de otra clave). La conexión no se reutiliza
+                self._discard()
+                raise
+
+    async def execute_if(self, key: str, expected: bytes, *args: Any) -> bool:
+        """
+        Ejecuta `args` solo si `key` vale `expected`, de forma atómica sin scripts:
+        WATCH + GET + MULTI/EXEC (EXEC no aplica nada si la clave cambió entre medias).
+        """
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await self.open()
+                await self._roundtrip("WATCH", key)
+                if await self._roundtrip("GET", key) != expected:
+                    await self._roundtrip("UNWATCH")
+                    return False
+                await self._roundtrip("MULTI")
+                await self._roundtrip(*args)
+                return await self._roundtrip("EXEC") is not None
+            except (TimeoutError, OSError, asyncio.IncompleteReadError) as e:
+                self._discard()
+                raise ConnectionError(f"RESP {self.host}:{self.port}: {e!r}") from e
+            except BaseException:
+                # Error o cancelación a medio WATCH/MULTI: estado desconocido y quizá
+                # respuestas sin leer. La conexión no se reutiliza
+                self._discard()
+                raise
+
+    def _discard(self) -> None:
+        # Síncrono: también vale con la tarea ya cancelada; la próxima llamada reabre
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+
+    async def close(self) -> None:
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+
+
+def connection_from_url(url: str, *, timeout: float = 1.0) -> RespConnection:
+    """redis://[:password@]host[:port][/db]"""
+    parts = urlsplit(url)
+    path = parts.path.lstrip("/")
+    return RespConnection(
+        parts.hostname or "localhost",
+        parts.port or 6379,
+        db=int(path) if path else 0,
+        password=unquote(parts.password) if parts.password else None,
+        timeout=timeout,
+    )
+
+
+class RedisBackend(CacheBackend):
+    """
+    Backend sobre protocolo Redis (RESP2). Usa una conexión para comandos y otra
+    dedicada a SUBSCRIBE; si la suscripción se cae avisa con `on_reset`, porque
+    pudieron perderse invalidaciones mientras estuvo desconectada.
+    """
+
+    def __init__(self, url: str, *, timeout: float = 1.0) -> None:
+        self.url = url
+        self.timeout = timeout
+        self._conn = self._new_connection()
+        self._handlers: dict[str, list[tuple[MessageHandler, ResetHandler | None]]] = {}
+        self._listeners: dict[str, asyncio.Task] = {}
+
+    def _new_connection(self) -> RespConnection:
+        return connection_from_url(self.url, timeout=self.timeout)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._conn.execute("GET", key)
+
+    async def mget(self, *keys: str) -> list[bytes | None]:
+        return await self._conn.execute("MGET", *keys)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._conn.execute("SET", key, value, "PX", max(1, int(ttl * 1000)))
+
+    async def set_if_absent(self, key: str, value: bytes, ttl: float) -> bool:
+        return await self._conn.execute("SET", key, value, "PX", max(1, int(ttl * 1000)), "NX") is not None
+
+    async def compare_and_set(self, key: str, expected: bytes, value: bytes, ttl: float) -> bool:
+        return await self._conn.execute_if(key, expected, "SET", key, value, "PX", max(1, int(ttl * 1000)))
+
+    async def compare_and_delete(self, key: str, expected: bytes) -> bool:
+        return await self._conn.execute_if(key, expected, "DEL", key)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._conn.execute("DEL", *keys)
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        await self._conn.execute("PUBLISH", channel, message)
+
+    async def subscribe(
+        self, channel: str, handler: MessageHandler, on_reset: ResetHandler | None = None
+    ) -> None:
+        self._handlers.setdefault(channel, []).append((handler, on_reset))
+        if channel not in self._listeners:
+            self._listeners[channel] = asyncio.create_task(self._listen(channel))
+
+    async def _listen(self, channel: str) -> None:
+        backoff = 0.1
+        reconnecting = False
+        while True:
+            conn = self._new_connection()
+            try:
+                reader, writer = await conn.open()
+                writer.write(encode_command("SUBSCRIBE", channel))
+                await writer.drain()
+                if reconnecting:
+                    # Lo publicado mientras estuvimos desconectados se perdió
+                    self._reset(channel)
+                reconnecting = False
+                backoff = 0.1
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        for handler, _ in self._handlers.get(channel, []):
+                            handler(reply[2])
+            except asyncio.CancelledError:
+                await conn.close()
+                raise
+            except Exception as e:
+                logger.warning("Suscripción RESP a {} caída ({!r}); reintento en {:.1f}s", channel, e, backoff)
+                await conn.close()
+                self._reset(channel)
+                reconnecting = True
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
+
+    def _reset(self, channel: str) -> None:
+        for _, on_reset in self._handlers.get(channel, []):
+            if on_reset is not None:
+                on_reset()
+
+    async def close(self) -> None:
+        for task in self._listeners.values():
+            task.cancel()
+        await asyncio.gather(*self._listeners.values(), return_exceptions=True)
+        self._listeners.clear()
+        await self._conn.close()
@@ -1,6 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import AnyHttpUrl, Field
-from typing import List
+
 
 class Settings(BaseSettings):
     # No .env
@@ -13,6 +12,83 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = "INFO"
     BACKEND_CORS_ORIGINS: str | None = "*"
 
+    # Endpoints /marcas/bulk
+    BULK_MAX_ITEMS: int = 5000
+    BULK_CHUNK_SIZE: int = 1000
+    # GET /marcas/export: filas por FETCH del cursor
+    EXPORT_BATCH_SIZE: int = 2000
+    # POST /marcas/import y scripts/import_marcas.py
+    IMPORT_CHUNK_SIZE: int = 5000
+    IMPORT_MAX_LINE_BYTES: int = 1_048_576
+    IMPORT_MAX_REJECTS_REPORTED: int = 1000
+
+    # ETag de GET /marcas/: una consulta extra por página (total de marca_stats +
+    # contador de marcas_version), constante aunque el filtro abarque toda la tabla
+    LIST_ETAG_ENABLED: bool = True
+
+    # Caché en proceso (GET /marcas/{id} y /detalles)
+    CACHE_MAXSIZE: int = 10000
+    CACHE_TTL_SECONDS: float = 60.0
+    STATS_CACHE_TTL_SECONDS: float = 10.0
+    # /detalles lee marca_stats (migración 0003) en vez de contar sobre marcas
+    STATS_SUMMARY_ENABLED: bool = True
+    # /detalles/series: buckets cerrados cacheados (solo se recalcula el actual)
+    ANALYTICS_CACHE_TTL_SECONDS: float = 86400.0
+    ANALYTICS_MAX_BUCKETS: int = 1000
+    # Backend compartido entre workers: "memory" (solo este proceso) o "redis"
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_REDIS_TIMEOUT_SECONDS: float = 0.5
+    CACHE_KEY_PREFIX: str = "marca-api"
+    # Subir al cambiar la forma de lo cacheado (2: schemas.Marca con updated_at,
+    # 3: valores etiquetados con su generación)
+    CACHE_KEY_VERSION: int = 3
+    CACHE_L1_TTL_SECONDS: float = 5.0
+
+    # Feed SSE (/eventos): "memory" (solo este worker) o "postgres" (LISTEN/NOTIFY entre workers)
+    EVENTS_BACKEND: str = "memory"
+    EVENTS_CHANNEL: str = "marca_events"
+    EVENTS_BUFFER_SIZE: int = 1000  # eventos recientes para reanudar con Last-Event-ID
+    EVENTS_QUEUE_SIZE: int = 256  # por cliente; si se llena, se le desconecta
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    EVENTS_RETRY_MS: int = 3000
+    EVENTS_STATS_DEBOUNCE_SECONDS: float = 1.0
+    EVENTS_BULK_IDS_PER_EVENT: int = 500
+
+    # Rate limit por cliente (core/ratelimit.py): token bucket por API key o IP -> 429.
+    # Desactivado por defecto: detrás de un proxy todas las peticiones traen su IP y
+    # compartirían un solo bucket; activarlo con API keys o con RATE_LIMIT_TRUST_FORWARDED
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_PER_SECOND: float = 20.0
+    RATE_LIMIT_BURST: int = 40
+    # "memory" (por worker) o "redis" (compartido, ventana fija sobre CACHE_REDIS_URL)
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_MAX_CLIENTS: int = 10000
+    RATE_LIMIT_KEY_HEADER: str = "X-API-Key"
+    # Solo detrás de un proxy de confianza: si no, cualquiera elige su IP
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    RATE_LIMIT_EXEMPT_PATHS: str = "/health,/metrics,/docs,/redoc,/openapi.json"
+    # Concurrencia por clase de ruta; por debajo del pool (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    # para que una ráfaga de lecturas no deje sin conexión a las escrituras -> 503
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_READS: int = 12
+    ADMISSION_MAX_WRITES: int = 4
+    ADMISSION_QUEUE_SIZE: int = 100  # en espera por clase; con la cola llena, 503 inmediato
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2.0
+
+    # Idempotency-Key en POST/PATCH/PUT/DELETE (core/idempotency.py). Almacén propio, sin
+    # LRU (solo TTL); con CACHE_BACKEND="memory" solo vale dentro de un worker, con "redis"
+    # usa CACHE_REDIS_URL (que el servidor no desaloje: maxmemory-policy noeviction o volatile-*)
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_HEADER: str = "Idempotency-Key"
+    IDEMPOTENCY_TTL_SECONDS: float = 86400.0  # cuánto se repite la respuesta guardada
+    # Reserva mientras se ejecuta la primera, renovada cada tercio; si el worker muere,
+    # la clave se libera al expirar
+    IDEMPOTENCY_LOCK_TTL_SECONDS: float = 60.0
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0  # espera de un duplicado en curso antes del 409
+    IDEMPOTENCY_MAX_BODY_BYTES: int = 1_048_576  # cuerpos mayores con clave -> 413
+    IDEMPOTENCY_MAX_RESPONSE_BYTES: int = 1_048_576  # respuestas mayores no se guardan
+
     # (no usados ya, los dejo por compatibilidad)
     POSTGRES_USER: str = "postgres"
     POSTGRES_PASSWORD: str = "postgres"
@@ -20,8 +96,48 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str = "localhost"
     POSTGRES_PORT: int = 5432
 
+    # Observabilidad: /metrics, log de queries lentas y cabecera Server-Timing (opt-in)
+    METRICS_ENABLED: bool = True
+    SLOW_QUERY_MS: float = 200.0
+    SERVER_TIMING_ENABLED: bool = False
+
+    # Pool de conexiones / asyncpg (bd/session.py)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # -1 = nunca reciclar
+    DB_POOL_PRE_PING: bool = True
+    DB_SSL: bool = True
+    # Caché de sentencias preparadas por conexión (0 si hay PgBouncer en modo transaction)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # statement_timeout del servidor en ms (0 = sin límite)
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    # Conexiones a abrir al arrancar (máx. DB_POOL_SIZE; 0 = ninguna) y si se
+    # preparan en ellas las consultas calientes (bd/warmup.py)
+    DB_POOL_WARMUP: int = 0
+    DB_WARMUP_PREPARE: bool = True
+    DB_WARMUP_TIMEOUT_SECONDS: float = 10.0
+
+    # URL async alternativa (BD local, benchmarks); si no se define se usa la de producción
+    ASYNC_DATABASE_URL: str | None = None
+    # Réplicas de lectura (URLs async separadas por comas): GET de marcas y /detalles
+    DATABASE_REPLICA_URLS: str | None = None
+    # Tras una escritura, ese cliente lee del primario durante este tiempo (cookie)
+    REPLICA_STICKY_SECONDS: int = 5
+    REPLICA_STICKY_COOKIE: str = "db_primary"
+    REPLICA_HEALTH_INTERVAL_SECONDS: float = 5.0
+    REPLICA_HEALTH_TIMEOUT_SECONDS: float = 2.0
+    # Réplica con más retraso que esto se considera no sana (0 = no mirar el retraso)
+    REPLICA_MAX_LAG_SECONDS: float = 30.0
+
+    @property
+    def replica_urls(self) -> list[str]:
+        return [u.strip() for u in (self.DATABASE_REPLICA_URLS or "").split(",") if u.strip()]
+
     @property
     def database_url(self) -> str:
+        if self.ASYNC_DATABASE_URL:
+            return self.ASYNC_DATABASE_URL
         # ASYNC (asyncpg) -> usa ssl=true (NO sslmode)
         return (
             "postgresql+asyncpg://registromarca_user:"
@@ -0,0 +1,260 @@
+import asyncio
+import itertools
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+import orjson
+from loguru import logger
+from sqlalchemy.engine import make_url
+
+from core.cache import ORIGIN
+from core.config import settings
+
+
+@dataclass
+class Event:
+    """Evento del feed; `frame` es el mensaje SSE ya serializado (se comparte entre clientes)."""
+
+    id: str
+    type: str
+    data: Any
+    frame: bytes = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.frame = b"id: %s\nevent: %s\ndata: %s\n\n" % (
+            self.id.encode(),
+            self.type.encode(),
+            orjson.dumps(self.data),
+        )
+
+    def wire(self) -> str:
+        return orjson.dumps({"id": self.id, "type": self.type, "data": self.data}).decode()
+
+
+# Para los clientes: lo que tenían puede estar desfasado, volver a pedir /detalles y la lista
+RESET_EVENT_TYPE = "reset"
+
+
+class Subscription:
+    """
+    Cola acotada de un cliente. Si se llena (cliente lento) se le desconecta en vez
+    de acumular memoria o frenar al resto: EventSource reconecta con Last-Event-ID
+    y recupera lo perdido del buffer, si sigue ahí.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.queue: asyncio.Queue[Event | None] = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def push(self, event: Event) -> bool:
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def drop(self) -> None:
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)  # fin del stream
+
+
+class PostgresRelay:
+    """
+    Reparte los eventos entre workers con LISTEN/NOTIFY sobre una conexión asyncpg
+    propia (fuera del pool). Todos los workers, incluido el que publica, reciben los
+    eventos por aquí, en orden de commit: el buffer de reanudación es el mismo en todos.
+    """
+
+    # NOTIFY admite payloads de menos de 8000 bytes
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, bus: "EventBus", url: str, channel: str) -> None:
+        self.bus = bus
+        self.url = url
+        self.channel = channel
+        self._conn: Any = None
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._ready = asyncio.Event()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    @property
+    def connected(self) -> bool:
+        return self._ready.is_set()
+
+    async def _connect(self) -> Any:
+        import asyncpg
+
+        kwargs: dict[str, Any] = {}
+        if settings.DB_SSL:
+            kwargs["ssl"] = True
+        return await asyncpg.connect(self.url, **kwargs)
+
+    async def _listen(self) -> None:
+        backoff = 0.1
+        reconnecting = False
+        while True:
+            lost = asyncio.Event()
+            try:
+                conn = await self._connect()
+                conn.add_termination_listener(lambda _conn, ev=lost: ev.set())
+                await conn.add_listener(self.channel, self._on_notify)
+                self._conn = conn
+                self._ready.set()
+                if reconnecting:
+                    # Lo notificado mientras estuvimos desconectados se perdió
+                    self.bus.reset()
+                reconnecting = False
+                backoff = 0.1
+                await lost.wait()
+                raise ConnectionError("conexión LISTEN cerrada")
+            except asyncio.CancelledError:
+                await self._close_conn()
+                raise
+            except Exception as e:
+                logger.warning("LISTEN {} caído ({!r}); reintento en {:.1f}s", self.channel, e, backoff)
+                self._ready.clear()
+                await self._close_conn()
+                if not reconnecting:
+                    self.bus.reset()
+                reconnecting = True
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
+
+    def _on_notify(self, _conn: Any, _pid: int, _channel: str, payload: str) -> None:
+        try:
+            message = orjson.loads(payload)
+            event = Event(message["id"], message["type"], message["data"])
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            return
+        self.bus.dispatch(event)
+
+    async def notify(self, event: Event) -> bool:
+        """False si no se pudo notificar (sin conexión o payload grande): el bus lo entrega en local."""
+        payload = event.wire()
+        if self._conn is None or not self.connected or len(payload.encode()) > self.MAX_PAYLOAD:
+            return False
+        try:
+            async with self._lock:
+                await self._conn.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+            return True
+        except Exception as e:
+            logger.warning("NOTIFY {} falló ({!r}); evento solo en este worker", self.channel, e)
+            return False
+
+    async def _close_conn(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                await conn.close(timeout=1)
+            except Exception:
+                conn.terminate()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._close_conn()
+
+
+class EventBus:
+    """
+    Pub/sub en proceso para el feed SSE. Guarda los últimos EVENTS_BUFFER_SIZE
+    eventos para reanudar con Last-Event-ID; con EVENTS_BACKEND="postgres" los
+    reparte entre workers vía PostgresRelay.
+    """
+
+    def __init__(self, *, buffer_size: int, queue_size: int, relay_url: str | None = None) -> None:
+        self.queue_size = queue_size
+        self._buffer: deque[Event] = deque(maxlen=buffer_size)
+        self._subscribers: set[Subscription] = set()
+        self._seq = itertools.count(1)
+        self._relay_url = relay_url
+        self._relay: PostgresRelay | None = None
+        self.published = 0
+        self.dropped = 0
+
+    def _ensure_relay(self) -> None:
+        if self._relay_url and self._relay is None:
+            self._relay = PostgresRelay(self, self._relay_url, settings.EVENTS_CHANNEL)
+            self._relay.start()
+
+    async def publish(self, type_: str, data: Any) -> Event:
+        self._ensure_relay()
+        # Ids únicos entre workers; el orden lo da la posición en el buffer
+        event = Event(f"{ORIGIN[:8]}-{next(self._seq)}", type_, data)
+        self.published += 1
+        if self._relay is None or not await self._relay.notify(event):
+            self.dispatch(event)
+        return event
+
+    def dispatch(self, event: Event) -> None:
+        self._buffer.append(event)
+        for sub in list(self._subscribers):
+            if not sub.push(event):
+                self.dropped += 1
+                self._subscribers.discard(sub)
+                sub.drop()
+
+    def subscribe(self, last_event_id: str | None = None) -> tuple[Subscription, list[Event] | None]:
+        """
+        Alta de un cliente. Devuelve (suscripción, pendientes): los eventos posteriores
+        a `last_event_id`, o None si ese id ya salió del buffer (el cliente debe resincronizar).
+        Sin await entre la lectura del buffer y el alta: no se pierde nada en medio.
+        """
+        self._ensure_relay()
+        backlog: list[Event] | None = []
+        if last_event_id:
+            ids = [event.id for event in self._buffer]
+            if last_event_id in ids:
+                backlog = list(self._buffer)[ids.index(last_event_id) + 1:]
+            else:
+                backlog = None
+        sub = Subscription(self.queue_size)
+        self._subscribers.add(sub)
+        return sub, backlog
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._subscribers.discard(sub)
+
+    def reset(self) -> None:
+        # Hubo un hueco (relay caído): el buffer ya no sirve para reanudar
+        self._buffer.clear()
+        self.dispatch(Event(f"{ORIGIN[:8]}-{next(self._seq)}", RESET_EVENT_TYPE, {}))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": "postgres" if self._relay_url else "memory",
+            "relay_connected": bool(self._relay and self._relay.connected),
+            "subscribers": len(self._subscribers),
+            "buffered": len(self._buffer),
+            "published": self.published,
+            "dropped_subscribers": self.dropped,
+        }
+
+    async def close(self) -> None:
+        if self._relay is not None:
+            await self._relay.close()
+            self._relay = None
+
+
+def _relay_url() -> str | None:
+    if settings.EVENTS_BACKEND != "postgres":
+        return None
+    # asyncpg.connect no entiende el "+asyncpg" de SQLAlchemy ni sus parámetros de query
+    url = make_url(settings.database_url).set(drivername="postgresql", query={})
+    return url.render_as_string(hide_password=False)
+
+
+event_bus = EventBus(
+    buffer_size=settings.EVENTS_BUFFER_SIZE,
+    queue_size=settings.EVENTS_QUEUE_SIZE,
+    relay_url=_relay_url(),
+)
@@ -0,0 +1,288 @@
+import asyncio
+import contextlib
+import hashlib
+import time
+import uuid
+from typing import Any
+
+import orjson
+from loguru import logger
+
+from core.cache_backend import CacheBackend, MemoryBackend, RedisBackend, RespError
+from core.config import settings
+from core.ratelimit import client_key, send_error
+
+IDEMPOTENT_METHODS = {"POST", "PATCH", "PUT", "DELETE"}
+REPLAYED_HEADER = b"idempotent-replayed"
+PENDING = "pending"
+DONE = "done"
+
+
+def _encode(meta: dict[str, Any], body: bytes = b"") -> bytes:
+    # Registro compacto: cabecera JSON (orjson no emite saltos de línea) + "\n" + cuerpo tal cual
+    return orjson.dumps(meta) + b"\n" + body
+
+
+def _decode(raw: bytes) -> tuple[dict[str, Any], bytes]:
+    meta, _, body = raw.partition(b"\n")
+    return orjson.loads(meta), body
+
+
+_backend: CacheBackend | None = None
+
+
+def get_idempotency_backend() -> CacheBackend:
+    """
+    Almacén propio, no el de la caché: en memoria sin LRU (solo caduca por TTL), así
+    el tráfico de lectura no desaloja reservas ni respuestas guardadas. Con Redis,
+    el mismo servidor con conexión propia (las claves llevan su prefijo `idem`).
+    """
+    global _backend
+    if _backend is None:
+        if settings.CACHE_BACKEND == "redis":
+            _backend = RedisBackend(settings.CACHE_REDIS_URL, timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS)
+        else:
+            _backend = MemoryBackend(maxsize=None)
+    return _backend
+
+
+async def close_idempotency_backend() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class IdempotencyMiddleware:
+    """
+    Middleware ASGI puro para la cabecera Idempotency-Key en escrituras.
+
+    La primera petición con una clave la reserva (SET NX con un token propio y TTL
+    corto, renovado mientras se ejecuta) y se ejecuta; su respuesta se guarda
+    IDEMPOTENCY_TTL_SECONDS y los reintentos la reciben tal cual, sin pasar por
+    el servicio. Un duplicado que llega mientras la primera sigue en curso espera
+    a que termine. Las claves son por cliente (como el rate limit) y la misma clave
+    con otra petición (método, ruta o cuerpo) es un 422. Las respuestas 5xx y 429
+    no se guardan: el reintento vuelve a ejecutarse. Cuerpos de más de
+    IDEMPOTENCY_MAX_BODY_BYTES con clave: 413. Si el backend falla, la petición
+    sigue sin idempotencia.
+    """
+
+    def __init__(self, app: Any, backend: CacheBackend | None = None) -> None:
+        self.app = app
+        self._backend = backend
+        self.header = settings.IDEMPOTENCY_HEADER.lower().encode()
+        # Despierta al momento a los duplicados de este worker; los de otros sondean
+        self._local: dict[str, asyncio.Event] = {}
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_idempotency_backend()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] not in IDEMPOTENT_METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        key = headers.get(self.header)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > 255:
+            await send_error(send, 400, f"{settings.IDEMPOTENCY_HEADER} debe tener entre 1 y 255 caracteres")
+            return
+
+        # El cuerpo entra en la huella y se guarda en memoria: acotado (p. ej. /marcas/import)
+        too_large = f"Cuerpo demasiado grande para usar {settings.IDEMPOTENCY_HEADER}"
+        length = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > settings.IDEMPOTENCY_MAX_BODY_BYTES:
+            await send_error(send, 413, too_large)
+            return
+        try:
+            body = await self._read_body(receive, settings.IDEMPOTENCY_MAX_BODY_BYTES)
+        except _BodyTooLarge:
+            await send_error(send, 413, too_large)
+            return
+
+        fingerprint = hashlib.blake2b(
+            b"\0".join((scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body)),
+            digest_size=16,
+        ).hexdigest()
+        storage_key = f"{settings.CACHE_KEY_PREFIX}:idem:{client_key(scope)}:{hashlib.blake2b(key, digest_size=16).hexdigest()}"
+        # El token distingue esta reserva de la de un reintento si la nuestra caducara
+        pending = _encode({"state": PENDING, "fp": fingerprint, "token": uuid.uuid4().hex})
+        replay_receive = self._replay_receive(body, receive)
+
+        try:
+            outcome, meta, stored = await self._claim(storage_key, fingerprint, pending)
+        except (ConnectionError, RespError) as e:
+            logger.warning("Idempotencia: backend no disponible ({!r}); se ejecuta sin clave", e)
+            await self.app(scope, replay_receive, send)
+            return
+        if outcome == "conflict":
+            await send_error(send, 422, f"{settings.IDEMPOTENCY_HEADER} ya usada con otra petición")
+        elif outcome == "busy":
+            await send_error(send, 409, f"Petición con la misma {settings.IDEMPOTENCY_HEADER} aún en curso", 1)
+        elif outcome == "replay":
+            await self._replay(send, meta, stored)
+        else:
+            await self._run_first(scope, replay_receive, send, storage_key, fingerprint, pending)
+
+    async def _claim(
+        self, storage_key: str, fingerprint: str, pending: bytes
+    ) -> tuple[str, dict[str, Any], bytes]:
+        """
+        ("run", ...) si esta petición se queda la clave; ("replay", meta, cuerpo) si ya
+        hay respuesta guardada; "conflict" / "busy" si es de otra petición o la primera
+        no termina en IDEMPOTENCY_WAIT_SECONDS.
+        """
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        delay = 0.05
+        while True:
+            if await self.backend.set_if_absent(storage_key, pending, settings.IDEMPOTENCY_LOCK_TTL_SECONDS):
+                return "run", {}, b""
+            raw = await self.backend.get(storage_key)
+            if raw is None:
+                # Caducó o la primera falló entre el SET NX y el GET: otro intento, sin martillear
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.5)
+                continue
+            meta, stored = _decode(raw)
+            if meta["fp"] != fingerprint:
+                return "conflict", meta, b""
+            if meta["state"] == DONE:
+                return "replay", meta, stored
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return "busy", meta, b""
+            event = self._local.get(storage_key)
+            if event is not None:
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(event.wait(), remaining)
+            else:
+                await asyncio.sleep(min(delay, remaining))
+                delay = min(delay * 2, 0.5)
+
+    async def _heartbeat(self, storage_key: str, pending: bytes, stop: asyncio.Event) -> None:
+        # Renueva la reserva mientras la petición sigue en curso: una escritura lenta
+        # no la pierde por TTL (y un reintento no la ejecuta otra vez). Se para con
+        # `stop` entre renovaciones, nunca cancelándola a medio compare_and_set
+        ttl = settings.IDEMPOTENCY_LOCK_TTL_SECONDS
+        while True:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(stop.wait(), ttl / 3)
+            if stop.is_set():
+                return
+            try:
+                if not await self.backend.compare_and_set(storage_key, pending, pending, ttl):
+                    logger.warning("Idempotencia: la reserva de {} caducó durante la petición", storage_key)
+                    return
+            except (ConnectionError, RespError) as e:
+                logger.warning("Idempotencia: no se pudo renovar la reserva ({!r})", e)
+
+    async def _run_first(
+        self, scope, receive, send, storage_key: str, fingerprint: str, pending: bytes
+    ) -> None:
+        event = self._local[storage_key] = asyncio.Event()
+        stop = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(storage_key, pending, stop))
+        start: dict[str, Any] | None = None
+        chunks: list[bytes] = []
+        size = 0
+        client_gone = False
+
+        async def capture(message: dict[str, Any]) -> None:
+            nonlocal start, size, client_gone
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body" and size <= settings.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                chunks.append(message.get("body", b""))
+                size += len(chunks[-1])
+            if client_gone:
+                return
+            try:
+                await send(message)
+            except OSError:
+                # El cliente cortó (timeout): se termina igual para que su reintento reciba esta respuesta
+                client_gone = True
+
+        stored = False
+        try:
+            try:
+                await self.app(scope, receive, capture)
+            finally:
+                # Espera a que termine la renovación en curso (shield: si cancelan esta
+                # tarea, no se propaga al heartbeat)
+                stop.set()
+                await asyncio.shield(heartbeat)
+            status = start["status"] if start is not None else 500
+            if status < 500 and status != 429 and size <= settings.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                meta = {
+                    "state": DONE,
+                    "fp": fingerprint,
+                    "status": status,
+                    "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in start["headers"]],
+                }
+                record = _encode(meta, b"".join(chunks))
+                try:
+                    # Solo sobre nuestra reserva: si caducó y la tomó un reintento, es suya
+                    stored = await self.backend.compare_and_set(
+                        storage_key, pending, record, settings.IDEMPOTENCY_TTL_SECONDS
+                    )
+                    if not stored:
+                        logger.warning("Idempotencia: reserva perdida, no se guarda la respuesta de {}", storage_key)
+                except (ConnectionError, RespError) as e:
+                    logger.warning("Idempotencia: no se pudo guardar la respuesta ({!r})", e)
+        finally:
+            if not stored:
+                # Libera la clave, solo si sigue siendo nuestra: el siguiente reintento
+                # (o el duplicado que espera) ejecuta de nuevo
+                try:
+                    await self.backend.compare_and_delete(storage_key, pending)
+                except (ConnectionError, RespError) as e:
+                    logger.warning("Idempotencia: no se pudo liberar la clave ({!r})", e)
+            if self._local.get(storage_key) is event:
+                del self._local[storage_key]
+            event.set()
+
+    async def _replay(self, send, meta: dict[str, Any], body: bytes) -> None:
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in meta["headers"]]
+        await send({
+            "type": "http.response.start",
+            "status": meta["status"],
+            "headers": [*headers, (REPLAYED_HEADER, b"true")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _read_body(receive, limit: int) -> bytes:
+        chunks: list[bytes] = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > limit:
+                raise _BodyTooLarge()
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    def _replay_receive(body: bytes, receive):
+        sent = False
+
+        async def replay() -> dict[str, Any]:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return replay
@@ -0,0 +1,176 @@
+import time
+from bisect import bisect_left
+from collections.abc import Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.config import settings
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    """Histograma acumulativo estilo Prometheus, con etiquetas. Sin locks: un solo hilo (asyncio)."""
+
+    def __init__(self, name: str, help_: str, buckets: Iterable[float]) -> None:
+        self.name = name
+        self.help = help_
+        self.buckets = sorted(buckets)
+        self._series: dict[Labels, list[float]] = {}  # [cuenta por bucket..., +Inf, sum]
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in self._series.items():
+            cumulative = 0.0
+            for bound, count in zip([*self.buckets, "+Inf"], series[:-1], strict=True):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_fmt(labels + (('le', le),))} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_fmt(labels)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_fmt(labels)} {cumulative:g}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_: str) -> None:
+        self.name = name
+        self.help = help_
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), value: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_fmt(labels)} {value:g}" for labels, value in self._values.items()]
+        return lines
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Latencia por ruta (plantilla), método y estado", LATENCY_BUCKETS
+)
+request_queries = Histogram("http_request_db_queries", "Queries SQL por petición", QUERY_COUNT_BUCKETS)
+request_db_time = Histogram("http_request_db_seconds", "Tiempo en BD por petición", LATENCY_BUCKETS)
+slow_queries = Counter("db_slow_queries_total", "Queries más lentas que SLOW_QUERY_MS")
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_time: float = 0.0
+
+
+# Estadísticas de la petición en curso; los hooks de SQLAlchemy las alimentan
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> RequestStats | None:
+    return _current.get()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Cuenta queries y tiempo en BD por petición y registra en el log las lentas."""
+    sync_engine = engine.sync_engine
+    slow_threshold = settings.SLOW_QUERY_MS / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+        if elapsed >= slow_threshold:
+            slow_queries.inc()
+            logger.warning("Query lenta ({:.1f} ms): {}", elapsed * 1000, statement[:2000])
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+class ObservabilityMiddleware:
+    """
+    Middleware ASGI puro (sin BaseHTTPMiddleware): mide latencia por ruta y
+    las queries/tiempo en BD de cada petición. Con SERVER_TIMING_ENABLED
+    añade la cabecera Server-Timing (app, db) a la respuesta.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING_ENABLED:
+                    app_ms = (time.perf_counter() - start) * 1000
+                    timing = (
+                        f'app;dur={app_ms:.1f}, db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"'
+                    )
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            request_latency.observe(
+                elapsed, (("method", scope["method"]), ("route", path), ("status", str(status)))
+            )
+            route_labels = (("route", path),)
+            request_queries.observe(stats.queries, route_labels)
+            request_db_time.observe(stats.db_time, route_labels)
+            _current.reset(token)
+
+
+def render_metrics(gauges: dict[str, float] | None = None) -> str:
+    """Exposición en formato texto de Prometheus; `gauges` añade valores instantáneos."""
+    lines: list[str] = []
+    for metric in (request_latency, request_queries, request_db_time, slow_queries):
+        lines += metric.render()
+    for name, value in (gauges or {}).items():
+        lines += [f"# TYPE {name} gauge", f"{name} {value:g}"]
+    return "\n".join(lines) + "\n"
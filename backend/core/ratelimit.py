@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+
+import orjson
+from loguru import logger
+
+from core.cache_backend import RespError, connection_from_url
+from core.config import settings
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class RateLimitStore(ABC):
+    """Estado del limitador por cliente."""
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> tuple[bool, float]:
+        """Consume un token de `key`: (permitido, segundos hasta poder reintentar)."""
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": type(self).__name__}
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Token bucket por cliente en este proceso; LRU acotado a `max_clients` claves."""
+
+    def __init__(self, max_clients: int) -> None:
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: int) -> tuple[bool, float]:
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - last) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": "memory", "clients": len(self._buckets)}
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """
+    Compartido entre workers sobre RESP (INCR + PEXPIRE, sin scripts Lua): ventana
+    fija de burst/rate segundos con `burst` peticiones, la aproximación del token
+    bucket que permiten esos comandos. Si el backend falla se degrada al limitador
+    en memoria de este worker, nunca a rechazar.
+    """
+
+    def __init__(self, url: str, *, timeout: float, prefix: str, fallback: RateLimitStore) -> None:
+        self._conn = connection_from_url(url, timeout=timeout)
+        self.prefix = prefix
+        self.fallback = fallback
+        self.errors = 0
+
+    async def take(self, key: str, rate: float, burst: int) -> tuple[bool, float]:
+        window = burst / rate
+        now = time.time()
+        index = int(now // window)
+        redis_key = f"{self.prefix}:rl:{key}:{index}"
+        try:
+            count = await self._conn.execute("INCR", redis_key)
+            if count == 1:
+                await self._conn.execute("PEXPIRE", redis_key, max(1, int(window * 2000)))
+        except (ConnectionError, RespError) as e:
+            self.errors += 1
+            logger.warning("Rate limit: backend compartido no disponible ({!r}); límite local", e)
+            return await self.fallback.take(key, rate, burst)
+        if count <= burst:
+            return True, 0.0
+        return False, (index + 1) * window - now
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": "redis", "errors": self.errors}
+
+    async def close(self) -> None:
+        await self._conn.close()
+
+
+class AdmissionGate:
+    """
+    Máximo `limit` peticiones a la vez de una clase (lecturas / escrituras). Las
+    siguientes esperan en cola hasta `timeout`; con la cola llena se rechaza al
+    momento. Así una ráfaga no agota el pool de conexiones ni deja sin turno al resto.
+    """
+
+    def __init__(self, name: str, *, limit: int, queue_size: int, timeout: float) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    async def acquire(self) -> bool:
+        if self._semaphore.locked():
+            if self.waiting >= self.queue_size:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except TimeoutError:
+                self.timeouts += 1
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected,
+            "rejected_timeout": self.timeouts,
+        }
+
+
+_store: RateLimitStore | None = None
+
+
+def get_rate_limit_store() -> RateLimitStore:
+    global _store
+    if _store is None:
+        memory = MemoryRateLimitStore(settings.RATE_LIMIT_MAX_CLIENTS)
+        if settings.RATE_LIMIT_BACKEND == "redis":
+            _store = RedisRateLimitStore(
+                settings.CACHE_REDIS_URL,
+                timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS,
+                prefix=settings.CACHE_KEY_PREFIX,
+                fallback=memory,
+            )
+        else:
+            _store = memory
+    return _store
+
+
+async def close_rate_limit_store() -> None:
+    global _store
+    if isinstance(_store, RedisRateLimitStore):
+        await _store.close()
+    _store = None
+
+
+gates = {
+    "read": AdmissionGate(
+        "read",
+        limit=settings.ADMISSION_MAX_READS,
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ),
+    "write": AdmissionGate(
+        "write",
+        limit=settings.ADMISSION_MAX_WRITES,
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ),
+}
+
+
+def client_key(scope: dict[str, Any]) -> str:
+    # API key si viene (hasheada: no se guarda en claro en el backend), si no la IP
+    headers = dict(scope.get("headers") or [])
+    api_key = headers.get(settings.RATE_LIMIT_KEY_HEADER.lower().encode())
+    if api_key:
+        return "key:" + hashlib.blake2b(api_key, digest_size=12).hexdigest()
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = headers.get(b"x-forwarded-for")
+        if forwarded:
+            return "ip:" + forwarded.split(b",")[0].strip().decode("latin-1")
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+async def send_error(send, status: int, detail: str, retry_after: float | None = None) -> None:
+    # Respuesta de error con el mismo cuerpo que HTTPException, desde un middleware ASGI
+    body = orjson.dumps({"detail": detail})
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(max(1, math.ceil(retry_after))).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI puro: token bucket por cliente (API key o IP) -> 429, y
+    concurrencia acotada por clase de ruta (lecturas / escrituras) -> 503, ambos
+    con Retry-After. Quedan fuera las rutas de RATE_LIMIT_EXEMPT_PATHS; el feed SSE
+    pasa el rate limit pero no ocupa plaza (es una conexión larga sin BD).
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        self.exempt = {p.strip() for p in settings.RATE_LIMIT_EXEMPT_PATHS.split(",") if p.strip()}
+        self.streaming = {f"{settings.API_V1_PREFIX}/eventos"}
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        if settings.RATE_LIMIT_ENABLED:
+            allowed, retry_after = await get_rate_limit_store().take(
+                client_key(scope), settings.RATE_LIMIT_PER_SECOND, settings.RATE_LIMIT_BURST
+            )
+            if not allowed:
+                await send_error(send, 429, "Demasiadas peticiones, reintentar más tarde", retry_after)
+                return
+        if not settings.ADMISSION_ENABLED or scope["path"] in self.streaming:
+            await self.app(scope, receive, send)
+            return
+        gate = gates["read" if scope["method"] in SAFE_METHODS else "write"]
+        if not await gate.acquire():
+            await send_error(send, 503, "Servidor saturado, reintentar más tarde", gate.timeout)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+
+def admission_stats() -> dict[str, Any]:
+    return {
+        "rate_limit": {
+            "enabled": settings.RATE_LIMIT_ENABLED,
+            "per_second": settings.RATE_LIMIT_PER_SECOND,
+            "burst": settings.RATE_LIMIT_BURST,
+            **get_rate_limit_store().stats(),
+        },
+        "admission": {"enabled": settings.ADMISSION_ENABLED, **{n: g.stats() for n, g in gates.items()}},
+    }
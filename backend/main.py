@@ -1,21 +1,61 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from loguru import logger
-import orjson
 
-from core.config import settings
 from api.v1.routers import api_router
+from bd.session import dispose_db, get_engine, pool_stats, replicas
+from bd.warmup import warm_up
+from core.cache import close_backend
+from core.config import settings
+from core.events import event_bus
+from core.idempotency import IdempotencyMiddleware, close_idempotency_backend
+from core.observability import ObservabilityMiddleware, instrument_engine, render_metrics
+from core.ratelimit import AdmissionMiddleware, close_rate_limit_store
+from services.feed_service import change_feed
 
-def orjson_dumps(v, *, default):
-    return orjson.dumps(v, default=default).decode()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Starting application...")
+    # Engines y pools se crean aquí, no al importar (arranque en frío más rápido)
+    engines = [get_engine(), *(replica.engine for replica in replicas.replicas)]
+    if settings.METRICS_ENABLED:
+        for instrumented in engines:
+            instrument_engine(instrumented)
+    if settings.DB_POOL_WARMUP:
+        await warm_up(engines, settings.DB_POOL_WARMUP)
+    try:
+        yield
+    finally:
+        logger.info("Shutting down application...")
+        await change_feed.close()
+        await event_bus.close()
+        await close_backend()
+        await close_rate_limit_store()
+        await close_idempotency_backend()
+        await dispose_db()
 
 app = FastAPI(
     title=settings.APP_NAME,
+    lifespan=lifespan,
     version=settings.APP_VERSION,
+    default_response_class=ORJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
 )
 
+# Rate limit por cliente y concurrencia por clase de ruta (429/503 con Retry-After).
+# Se registra antes que CORS para que los rechazos también lleven sus cabeceras
+app.add_middleware(AdmissionMiddleware)
+
+# Idempotency-Key: por fuera de la admisión, así un duplicado que espera a la
+# primera petición o una respuesta repetida no ocupan plaza ni gastan rate limit
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(IdempotencyMiddleware)
+
 # CORS
 origins = ["*"] if settings.BACKEND_CORS_ORIGINS in (None, "", "*") else [
     o.strip() for o in settings.BACKEND_CORS_ORIGINS.split(",")
@@ -26,20 +66,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "ETag", "Retry-After", "Idempotent-Replayed"],
 )
 
+# Métricas: latencia por ruta, queries/tiempo en BD por petición, queries lentas
+# (los engines se instrumentan en lifespan)
+if settings.METRICS_ENABLED:
+    app.add_middleware(ObservabilityMiddleware)
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    pool = pool_stats()
+    gauges = {
+        f"db_pool_{key}": value
+        for key, value in pool.items()
+        if key in ("size", "checked_in", "checked_out", "overflow", "wait_avg_ms", "wait_max_ms")
+    }
+    return PlainTextResponse(render_metrics(gauges), media_type="text/plain; version=0.0.4")
+
 # Routers
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
-
-# Startup/Shutdown logs
-@app.on_event("startup")
-async def on_startup():
-    logger.info("Starting application...")
-
-@app.on_event("shutdown")
-async def on_shutdown():
-    logger.info("Shutting down application...")
\ No newline at end of file
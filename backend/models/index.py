@@ -1,8 +1,34 @@
 from datetime import datetime
+
+from sqlalchemy import TIMESTAMP, BigInteger, Integer, SmallInteger, String, func
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, Integer, TIMESTAMP, func
+from sqlalchemy.sql.functions import FunctionElement
+
 from bd.base import Base
 
+
+class clock_timestamp(FunctionElement):
+    """
+    Hora real de la sentencia en PostgreSQL (clock_timestamp()), no la del inicio de
+    la transacción como now(). Sigue siendo la hora de la sentencia, no la del commit:
+    no ordena escrituras de transacciones distintas (para eso, marcas_version). En
+    otros motores, CURRENT_TIMESTAMP.
+    """
+    type = TIMESTAMP(timezone=True)
+    inherit_cache = True
+
+
+@compiles(clock_timestamp)
+def _clock_timestamp_default(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(clock_timestamp, "postgresql")
+def _clock_timestamp_pg(element, compiler, **kw):
+    return "clock_timestamp()"
+
+
 class Marca(Base):
     __tablename__ = "marcas"
 
@@ -18,3 +44,31 @@ class Marca(Base):
     approved_at: Mapped["datetime"] = mapped_column(
         TIMESTAMP(timezone=True), nullable=True
     )
+    # Versión de la fila para ETag / If-Match (migración 0004); la pone cada UPDATE
+    updated_at: Mapped["datetime"] = mapped_column(
+        TIMESTAMP(timezone=True), server_default=func.now(), onupdate=clock_timestamp(), nullable=False
+    )
+
+
+class MarcaStat(Base):
+    """
+    Contadores de /detalles mantenidos por triggers (migración 0003):
+    ('estado', <estado>) y ('aprobadas', 'YYYY-MM' en UTC) para marcas ACTIVA.
+    """
+    __tablename__ = "marca_stats"
+
+    dimension: Mapped[str] = mapped_column(String(20), primary_key=True)
+    clave: Mapped[str] = mapped_column(String(32), primary_key=True)
+    total: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+
+
+class MarcasVersion(Base):
+    """
+    Versión de la colección (migración 0007): fila única que sube un trigger BEFORE
+    por sentencia en cada INSERT/UPDATE/DELETE/TRUNCATE de marcas. El bloqueo de la
+    fila dura hasta el commit, así que el contador sigue el orden de commit.
+    """
+    __tablename__ = "marcas_version"
+
+    id: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
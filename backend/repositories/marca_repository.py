@@ -1,10 +1,53 @@
-from datetime import datetime, timezone
-from typing import Sequence, Optional
+import builtins
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+
+import orjson
+from sqlalchemy import (
+    Integer,
+    Row,
+    Select,
+    String,
+    and_,
+    case,
+    column,
+    delete,
+    func,
+    insert,
+    select,
+    text,
+    update,
+    values,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
-from models.index import Marca
+
+from models.index import Marca, MarcaStat, MarcasVersion
 from schemas import Marca as schemas
 
+SEARCH_MODES = ("contains", "prefix")
+IMPORT_STAGE_TABLE = "marcas_import_stage"
+IMPORT_COLUMNS = ("titulo", "nombre", "estado")
+# Columnas de schemas.Marca, para las rutas que serializan filas sin pasar por ORM
+LIST_COLUMNS = (Marca.nombre, Marca.titulo, Marca.estado, Marca.id, Marca.updated_at)
+
+
+def _escape_like(value: str) -> str:
+    # Los comodines del usuario se buscan literalmente
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _approved_at_on_activation(nuevo_estado):
+    # approved_at = now() la primera vez que la marca pasa a ACTIVA; se evalúa
+    # contra la fila vigente dentro del propio UPDATE
+    return case(
+        (
+            and_(nuevo_estado == "ACTIVA", Marca.estado != "ACTIVA", Marca.approved_at.is_(None)),
+            func.now(),
+        ),
+        else_=Marca.approved_at,
+    )
+
+
 class MarcaRepository:
     async def create(self, db: AsyncSession, data: schemas.MarcaCreate) -> Marca:
         marca = Marca(**data.model_dump())
@@ -14,51 +57,301 @@ class MarcaRepository:
         await db.commit()
         return marca
 
-    async def get(self, db: AsyncSession, marca_id: int) -> Optional[Marca]:
+    async def get(self, db: AsyncSession, marca_id: int) -> Marca | None:
         result = await db.execute(select(Marca).where(Marca.id == marca_id))
         return result.scalars().first()
 
     async def list(
         self,
         db: AsyncSession,
-        search: Optional[str] = None,
-        estado: Optional[str] = None,
+        search: str | None = None,
+        estado: str | None = None,
         limit: int = 50,
         offset: int = 0,
+        after_id: int | None = None,
+        match: str = "contains",
+        rank: bool = False,
     ) -> Sequence[Marca]:
-        stmt = select(Marca)
-        if search:
-            ilike = f"%{search}%"
-            stmt = stmt.where((Marca.titulo.ilike(ilike)) | (Marca.nombre.ilike(ilike)))
-        if estado:
-            stmt = stmt.where(Marca.estado == estado)
-        stmt = stmt.order_by(Marca.id).limit(limit).offset(offset)
+        stmt = self._page(
+            self._filter(select(Marca), search=search, estado=estado, match=match),
+            search=search, limit=limit, offset=offset, after_id=after_id, rank=rank,
+        )
         res = await db.execute(stmt)
         marcas = res.scalars().all()
         return [marca for marca in marcas]
 
+    async def list_rows(
+        self,
+        db: AsyncSession,
+        search: str | None = None,
+        estado: str | None = None,
+        limit: int = 50,
+        offset: int = 0,
+        after_id: int | None = None,
+        match: str = "contains",
+        rank: bool = False,
+        with_total: bool = False,
+    ) -> Sequence[Row]:
+        # Igual que `list` pero solo las columnas de schemas.Marca, como tuplas (sin ORM).
+        # with_total añade la columna `total` = COUNT(*) OVER(): filas que cumplen el filtro
+        # antes de LIMIT/OFFSET, en la misma consulta (con `after_id`, solo las posteriores)
+        columns = [*LIST_COLUMNS, func.count().over().label("total")] if with_total else LIST_COLUMNS
+        stmt = self._page(
+            self._filter(select(*columns), search=search, estado=estado, match=match),
+            search=search, limit=limit, offset=offset, after_id=after_id, rank=rank,
+        )
+        res = await db.execute(stmt)
+        return res.all()
+
+    async def stream_rows(
+        self,
+        db: AsyncSession,
+        *,
+        search: str | None = None,
+        estado: str | None = None,
+        match: str = "contains",
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Row]]:
+        # Cursor del lado del servidor: trae `batch_size` filas por FETCH, memoria plana
+        stmt = (
+            self._filter(select(*LIST_COLUMNS), search=search, estado=estado, match=match)
+            .order_by(Marca.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await db.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
+    async def collection_version(
+        self, db: AsyncSession, *, summary: bool = True
+    ) -> tuple[int, int | datetime | None]:
+        """
+        (total, versión) de toda la tabla sin recorrerla. Con `summary` (triggers de
+        las migraciones 0003 y 0007) el total sale de marca_stats y la versión de
+        marcas_version. Ese contador sube en orden de commit, así que ninguna
+        escritura confirmada deja la versión igual. Sin ellos: count(*) y
+        max(updated_at). updated_at es la hora de la sentencia, no la del commit.
+        Una transacción que escribe antes que otra pero confirma después no sube el
+        max. Hasta la siguiente escritura, una página puede responder 304 con datos
+        viejos. Es más grueso que versionar por filtro (una escritura fuera del
+        filtro también la cambia), pero no depende del tamaño del conjunto filtrado.
+        """
+        if summary:
+            total = (
+                select(func.coalesce(func.sum(MarcaStat.total), 0))
+                .where(MarcaStat.dimension == "estado")
+                .scalar_subquery()
+            )
+            version = select(MarcasVersion.version).where(MarcasVersion.id == 1).scalar_subquery()
+        else:
+            total = select(func.count()).select_from(Marca).scalar_subquery()
+            version = select(func.max(Marca.updated_at)).scalar_subquery()
+        total_rows, current = (await db.execute(select(total, version))).one()
+        return int(total_rows), current
+
+    async def count(
+        self,
+        db: AsyncSession,
+        *,
+        search: str | None = None,
+        estado: str | None = None,
+        match: str = "contains",
+    ) -> int:
+        stmt = self._filter(select(func.count()).select_from(Marca), search=search, estado=estado, match=match)
+        return int(await db.scalar(stmt))
+
+    async def summary_count(self, db: AsyncSession, *, estado: str | None = None) -> int:
+        # Exacto y O(1): contadores por estado de marca_stats (migración 0003)
+        stmt = select(func.coalesce(func.sum(MarcaStat.total), 0)).where(MarcaStat.dimension == "estado")
+        if estado:
+            stmt = stmt.where(MarcaStat.clave == estado)
+        return int(await db.scalar(stmt))
+
+    async def estimate_count(
+        self,
+        db: AsyncSession,
+        *,
+        search: str | None = None,
+        estado: str | None = None,
+        match: str = "contains",
+    ) -> int:
+        """
+        Estimación sin recorrer la tabla (solo PostgreSQL): sin filtros,
+        pg_class.reltuples (del último ANALYZE/autovacuum); con filtros, las filas
+        que el planificador estima para la consulta (EXPLAIN, no la ejecuta).
+        """
+        if not search and not estado:
+            reltuples = await db.scalar(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'marcas'::regclass")
+            )
+            # -1: tabla nunca analizada
+            if reltuples is not None and reltuples >= 0:
+                return int(reltuples)
+        stmt = self._filter(select(Marca.id), search=search, estado=estado, match=match)
+        conn = await db.connection()
+        compiled = stmt.compile(dialect=conn.dialect)
+        params = [compiled.params[name] for name in compiled.positiontup or ()]
+        raw = await conn.get_raw_connection()
+        # Por el driver con los mismos parámetros posicionales ($n): nada se interpola en el SQL
+        plan = await raw.driver_connection.fetchval(f"EXPLAIN (FORMAT JSON) {compiled.string}", *params)
+        if isinstance(plan, (str, bytes)):
+            # El dialecto asyncpg de SQLAlchemy registra un codec json y ya llega decodificado;
+            # sin ese codec asyncpg devuelve el texto
+            plan = orjson.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def _filter(
+        self, stmt: Select, *, search: str | None, estado: str | None, match: str = "contains"
+    ) -> Select:
+        if search:
+            # ILIKE '%x%' / 'x%' lo resuelven los índices GIN de trigramas (0002)
+            term = _escape_like(search)
+            pattern = f"{term}%" if match == "prefix" else f"%{term}%"
+            stmt = stmt.where(
+                Marca.titulo.ilike(pattern, escape="\\") | Marca.nombre.ilike(pattern, escape="\\")
+            )
+        if estado:
+            stmt = stmt.where(Marca.estado == estado)
+        return stmt
+
+    def _page(
+        self,
+        stmt: Select,
+        *,
+        search: str | None,
+        limit: int,
+        offset: int,
+        after_id: int | None,
+        rank: bool,
+    ) -> Select:
+        if after_id is not None:
+            # Keyset: busca por PK en vez de saltar `offset` filas
+            stmt = stmt.where(Marca.id > after_id)
+        if search and rank:
+            # Más parecidas primero (pg_trgm.similarity); id desempata
+            score = func.greatest(func.similarity(Marca.titulo, search), func.similarity(Marca.nombre, search))
+            stmt = stmt.order_by(score.desc(), Marca.id)
+        else:
+            stmt = stmt.order_by(Marca.id)
+        stmt = stmt.limit(limit)
+        if offset:
+            stmt = stmt.offset(offset)
+        return stmt
+
     async def update(
         self,
         db: AsyncSession,
         marca_id: int,
-        changes:schemas.MarcaPatch
-    ) -> Optional[Marca]:
-        marca = await self.get(db, marca_id)
-        if marca and changes.estado == "ACTIVA" and marca.estado != "ACTIVA" and marca.approved_at is None:
-                marca.approved_at = datetime.now(timezone.utc)
-        if not marca:
-            return None
-        for attr, value in changes.model_dump().items():
-            if value is not None:
-                setattr(marca, attr, value)
+        changes:schemas.MarcaPatch,
+        if_updated_at: builtins.list[datetime] | None = None,
+    ) -> Marca | None:
+        # Un solo UPDATE ... RETURNING: sin SELECT previo ni refresh.
+        # Con `if_updated_at` (If-Match) solo actualiza si la versión coincide; si no, None
+        fields = {attr: value for attr, value in changes.model_dump().items() if value is not None}
+        if not fields:
+            marca = await self.get(db, marca_id)
+            if marca and if_updated_at is not None and marca.updated_at not in if_updated_at:
+                return None
+            return marca
+        if changes.estado == "ACTIVA":
+            # El CASE ve la fila bloqueada por el UPDATE: dos PATCH concurrentes
+            # a ACTIVA no pueden pisar el approved_at del primero
+            fields["approved_at"] = _approved_at_on_activation(changes.estado)
+        stmt = (
+            update(Marca)
+            .where(Marca.id == marca_id, *self._version_filter(if_updated_at))
+            .values(**fields)
+            .returning(Marca)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        marca = (await db.scalars(stmt)).first()
         await db.commit()
-        await db.refresh(marca)
         return marca
 
-    async def delete(self, db: AsyncSession, marca_id: int) -> bool:
-        marca = await self.get(db, marca_id)
-        if not marca:
-            return False
-        await db.delete(marca)
+    async def delete(
+        self, db: AsyncSession, marca_id: int, if_updated_at: builtins.list[datetime] | None = None
+    ) -> bool:
+        res = await db.execute(
+            delete(Marca)
+            .where(Marca.id == marca_id, *self._version_filter(if_updated_at))
+            .returning(Marca.id)
+        )
+        deleted = res.scalar_one_or_none()
+        await db.commit()
+        return deleted is not None
+
+    def _version_filter(self, if_updated_at: builtins.list[datetime] | None) -> builtins.list:
+        # La comprobación va en el propio WHERE: atómica frente a escrituras concurrentes
+        return [] if if_updated_at is None else [Marca.updated_at.in_(if_updated_at)]
+
+    async def bulk_create(self, db: AsyncSession, items: builtins.list[schemas.MarcaCreate]) -> builtins.list[Marca]:
+        # INSERT ... VALUES (...), (...) RETURNING por lotes (insertmanyvalues), una transacción;
+        # sort_by_parameter_order garantiza que la fila i corresponde al item i
+        stmt = insert(Marca).returning(Marca, sort_by_parameter_order=True)
+        res = await db.scalars(stmt, [item.model_dump() for item in items])
+        marcas = list(res.all())
+        await db.commit()
+        return marcas
+
+    async def bulk_update(
+        self, db: AsyncSession, items: builtins.list[schemas.MarcaBulkPatch], chunk_size: int = 1000
+    ) -> builtins.list[Marca]:
+        """
+        UPDATE marcas SET ... FROM (VALUES ...) v WHERE marcas.id = v.id RETURNING marcas.*
+        Los campos None conservan su valor; approved_at sigue la regla de `update`.
+        Los ids deben venir sin repetir. Devuelve solo las filas que existían.
+        """
+        updated: list[Marca] = []
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            v = values(
+                column("id", Integer),
+                column("titulo", String),
+                column("nombre", String),
+                column("estado", String),
+                name="v",
+            ).data([(i.id, i.titulo, i.nombre, i.estado) for i in chunk])
+            stmt = (
+                update(Marca)
+                .where(Marca.id == v.c.id)
+                .values(
+                    titulo=func.coalesce(v.c.titulo, Marca.titulo),
+                    nombre=func.coalesce(v.c.nombre, Marca.nombre),
+                    estado=func.coalesce(v.c.estado, Marca.estado),
+                    approved_at=_approved_at_on_activation(v.c.estado),
+                )
+                .returning(Marca)
+                .execution_options(synchronize_session=False, populate_existing=True)
+            )
+            updated.extend((await db.scalars(stmt)).all())
+        await db.commit()
+        return updated
+
+    async def bulk_delete(self, db: AsyncSession, ids: builtins.list[int]) -> builtins.list[int]:
+        res = await db.execute(delete(Marca).where(Marca.id.in_(ids)).returning(Marca.id))
+        deleted = list(res.scalars().all())
+        await db.commit()
+        return deleted
+
+    # --- Importación masiva vía COPY (services/import_service.py) ---
+
+    async def start_import(self, db: AsyncSession) -> None:
+        # Tabla temporal de staging: desaparece al terminar la transacción
+        await db.execute(text(
+            f"CREATE TEMP TABLE {IMPORT_STAGE_TABLE} "
+            "(titulo VARCHAR(255), nombre VARCHAR(255), estado VARCHAR(20)) ON COMMIT DROP"
+        ))
+
+    async def copy_import_records(self, db: AsyncSession, records: builtins.list[tuple]) -> None:
+        # COPY binario de asyncpg sobre la conexión (y transacción) de la sesión
+        conn = await db.connection()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            IMPORT_STAGE_TABLE, records=records, columns=list(IMPORT_COLUMNS)
+        )
+
+    async def finish_import(self, db: AsyncSession) -> int:
+        cols = ", ".join(IMPORT_COLUMNS)
+        res = await db.execute(text(f"INSERT INTO marcas ({cols}) SELECT {cols} FROM {IMPORT_STAGE_TABLE}"))
         await db.commit()
-        return True
+        return res.rowcount
@@ -1,9 +1,24 @@
 # app/repositories/metrics_repository.py
-from typing import List, Tuple
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import CTE, and_, desc, func, or_, select, text, true
+from sqlalchemy.engine import RowMapping
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, and_
-from models.index import Marca
-from datetime import datetime, timezone
+
+from models.index import Marca, MarcaStat
+
+# Series de /detalles/series: columna de fecha y condición de cada métrica
+SERIES_COLUMNS = {"registros": Marca.created_at, "aprobaciones": Marca.approved_at}
+
+# Lo que marca_stats debería contener según `marcas` (misma regla que los triggers de 0003)
+SUMMARY_SOURCE_SQL = """
+    SELECT 'estado' AS dimension, estado AS clave, count(*) AS total FROM marcas GROUP BY estado
+    UNION ALL
+    SELECT 'aprobadas', to_char(approved_at AT TIME ZONE 'UTC', 'YYYY-MM'), count(*)
+    FROM marcas WHERE estado = 'ACTIVA' AND approved_at IS NOT NULL
+    GROUP BY 2
+"""
 
 class MetricsRepository:
     async def total_marcas(self, db: AsyncSession) -> int:
@@ -20,11 +35,11 @@ class MetricsRepository:
         return await self.count_pendientes(db)
 
     async def count_aprobadas_este_mes(self, db: AsyncSession, *, start_month: datetime, next_month: datetime) -> int:
+        # count(*) y no count(id): con el índice parcial (0006) es un index-only scan
         res = await db.execute(
-            select(func.count(Marca.id)).where(
+            select(func.count()).select_from(Marca).where(
                 and_(
                     Marca.estado == "ACTIVA",
-                    Marca.approved_at.is_not(None),
                     Marca.approved_at >= start_month,
                     Marca.approved_at < next_month,
                 )
@@ -32,7 +47,7 @@ class MetricsRepository:
         )
         return int(res.scalar_one())
 
-    async def last_n_marcas(self, db: AsyncSession, n: int = 3) -> List[Marca]:
+    async def last_n_marcas(self, db: AsyncSession, n: int = 3) -> list[Marca]:
         # Usar created_at si existe; fallback a id
         stmt = (
             select(Marca)
@@ -42,3 +57,142 @@ class MetricsRepository:
         res = await db.execute(stmt)
         res = res.scalars().all()
         return [marca for marca in res]
+
+    async def stats_and_last_n(
+        self,
+        db: AsyncSession,
+        *,
+        start_month: datetime,
+        next_month: datetime,
+        n: int = 3,
+    ) -> tuple[dict[str, int], list[RowMapping]]:
+        """
+        Contadores + últimas N marcas en un solo round trip.
+
+        Los contadores salen de un único scan con agregados condicionales
+        (COUNT(*) FILTER (...)); las últimas N se unen con LEFT JOIN ON true,
+        así la fila de contadores llega aunque la tabla esté vacía.
+        Vencimientos = pendientes, por eso no se calcula aparte.
+        """
+        counters = select(
+            func.count().label("total"),
+            func.count().filter(Marca.estado == "INACTIVA").label("pendientes"),
+            func.count()
+            .filter(
+                and_(
+                    Marca.estado == "ACTIVA",
+                    Marca.approved_at >= start_month,
+                    Marca.approved_at < next_month,
+                )
+            )
+            .label("aprobadas_mes"),
+        ).cte("counters")
+        return await self._with_last_n(db, counters, n)
+
+    async def summary_stats_and_last_n(
+        self,
+        db: AsyncSession,
+        *,
+        month_key: str,
+        n: int = 3,
+    ) -> tuple[dict[str, int], list[RowMapping]]:
+        """
+        Igual que `stats_and_last_n` pero leyendo los contadores de marca_stats
+        (O(1): unas pocas filas) en vez de recorrer marcas. month_key = 'YYYY-MM' (UTC).
+        """
+        estado = MarcaStat.dimension == "estado"
+        aprobadas_mes = and_(MarcaStat.dimension == "aprobadas", MarcaStat.clave == month_key)
+        counters = (
+            select(
+                func.coalesce(func.sum(MarcaStat.total).filter(estado), 0).label("total"),
+                func.coalesce(
+                    func.sum(MarcaStat.total).filter(and_(estado, MarcaStat.clave == "INACTIVA")), 0
+                ).label("pendientes"),
+                func.coalesce(func.sum(MarcaStat.total).filter(aprobadas_mes), 0).label("aprobadas_mes"),
+            )
+            .where(or_(estado, aprobadas_mes))
+            .cte("counters")
+        )
+        return await self._with_last_n(db, counters, n)
+
+    async def _with_last_n(
+        self, db: AsyncSession, counters: CTE, n: int
+    ) -> tuple[dict[str, int], list[RowMapping]]:
+        # counters (una fila) LEFT JOIN últimas N: un solo round trip
+        ultimas = (
+            select(Marca.id, Marca.titulo, Marca.nombre, Marca.estado, Marca.created_at)
+            .order_by(desc(Marca.created_at), desc(Marca.id))
+            .limit(n)
+            .cte("ultimas")
+        )
+        stmt = (
+            select(
+                counters.c.total,
+                counters.c.pendientes,
+                counters.c.aprobadas_mes,
+                ultimas.c.id,
+                ultimas.c.titulo,
+                ultimas.c.nombre,
+                ultimas.c.estado,
+            )
+            .select_from(counters.outerjoin(ultimas, true()))
+            .order_by(desc(ultimas.c.created_at), desc(ultimas.c.id))
+        )
+        rows = (await db.execute(stmt)).mappings().all()
+
+        first = rows[0]
+        stats: dict[str, int] = {
+            "total": int(first["total"]),
+            "pendientes": int(first["pendientes"]),
+            "aprobadas_mes": int(first["aprobadas_mes"]),
+        }
+        ultimas_rows = [row for row in rows if row["id"] is not None]
+        return stats, ultimas_rows
+
+    async def bucket_counts(
+        self,
+        db: AsyncSession,
+        *,
+        metric: str,
+        granularity: str,
+        tz: str,
+        start: datetime,
+        end: datetime,
+    ) -> list[tuple[datetime, int]]:
+        """
+        (inicio del bucket en hora local de `tz`, total) para [start, end), solo
+        buckets con filas. Aprobaciones = marcas ACTIVA por approved_at, como en /detalles.
+        El rango va sobre la columna tal cual: usa ix_marcas_created_at_id / ix_marcas_approved_activa (0006).
+        """
+        column = SERIES_COLUMNS[metric]
+        bucket = func.date_trunc(granularity, func.timezone(tz, column))
+        stmt = select(bucket, func.count()).where(column >= start, column < end)
+        if metric == "aprobaciones":
+            stmt = stmt.where(Marca.estado == "ACTIVA")
+        # Por posición: la expresión con parámetros repetida no casaría con el GROUP BY
+        stmt = stmt.group_by(text("1")).order_by(text("1"))
+        return [(row[0], int(row[1])) for row in (await db.execute(stmt)).all()]
+
+    async def summary_drift(self, db: AsyncSession) -> list[dict[str, Any]]:
+        """Claves donde marca_stats no coincide con un recuento completo de marcas."""
+        res = await db.execute(text(f"""
+            SELECT coalesce(e.dimension, s.dimension) AS dimension,
+                   coalesce(e.clave, s.clave) AS clave,
+                   coalesce(e.total, 0) AS expected,
+                   coalesce(s.total, 0) AS actual
+            FROM ({SUMMARY_SOURCE_SQL}) e
+            FULL JOIN marca_stats s ON s.dimension = e.dimension AND s.clave = e.clave
+            WHERE coalesce(e.total, 0) <> coalesce(s.total, 0)
+            ORDER BY 1, 2
+        """))
+        return [dict(row) for row in res.mappings().all()]
+
+    async def rebuild_summary(self, db: AsyncSession) -> int:
+        # SHARE bloquea escrituras en marcas (no lecturas) mientras se reconstruye
+        await db.execute(text("LOCK TABLE marcas IN SHARE MODE"))
+        await db.execute(text("DELETE FROM marca_stats"))
+        res = await db.execute(text(
+            f"INSERT INTO marca_stats (dimension, clave, total) SELECT * FROM ({SUMMARY_SOURCE_SQL}) e"
+        ))
+        await db.commit()
+        return res.rowcount
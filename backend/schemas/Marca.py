@@ -1,5 +1,7 @@
-from typing import Optional, Literal
-from pydantic import BaseModel, Field, ConfigDict
+from datetime import datetime
+from typing import Any, Literal
+
+from pydantic import BaseModel, ConfigDict, Field
 
 EstadoLiteral = Literal["ACTIVA", "INACTIVA", "SUSPENDIDA"]
 
@@ -13,10 +15,46 @@ class MarcaCreate(MarcaBase):
 
 class Marca(MarcaBase):
     id: int
+    updated_at: datetime | None = None
     # Pydantic v2: activar lectura por atributos (ORM)
     model_config = ConfigDict(from_attributes=True)
 
+class MarcaPage(BaseModel):
+    # GET /marcas/?total=exact|estimate
+    items: list[Marca]
+    total: int | None = None
+    total_exact: bool | None = None
+    next_cursor: str | None = None
+
 class MarcaPatch(BaseModel):
-    nombre: Optional[str] = Field(None, min_length=1, max_length=255)
-    titulo: Optional[str] = Field(None, min_length=1, max_length=255)
-    estado: Optional[EstadoLiteral] = None
+    nombre: str | None = Field(None, min_length=1, max_length=255)
+    titulo: str | None = Field(None, min_length=1, max_length=255)
+    estado: EstadoLiteral | None = None
+
+class MarcaBulkPatch(MarcaPatch):
+    id: int
+
+class BulkItemResult(BaseModel):
+    index: int
+    ok: bool
+    id: int | None = None
+    marca: Marca | None = None
+    errors: list[dict[str, Any]] = Field(default_factory=list)
+
+class BulkResult(BaseModel):
+    total: int
+    ok: int
+    failed: int
+    results: list[BulkItemResult]
+
+class ImportRejectedRow(BaseModel):
+    line: int
+    errors: list[dict[str, Any]]
+
+class ImportReport(BaseModel):
+    format: str
+    total: int
+    imported: int
+    rejected: int
+    rejected_rows: list[ImportRejectedRow]
+    rejected_truncated: bool = False
@@ -0,0 +1,215 @@
+# scripts/fake_redis.py
+"""
+Servidor mínimo compatible con el protocolo Redis (RESP2) para desarrollo y CI.
+
+Implementa lo que usa core/cache_backend.RedisBackend: PING, AUTH, SELECT, GET, MGET,
+SET [PX|EX] [NX|XX], DEL, INCR, PEXPIRE, PTTL, WATCH/UNWATCH, MULTI/EXEC/DISCARD,
+PUBLISH y SUBSCRIBE. Todo en memoria, un solo proceso; no pretende ser un Redis completo.
+
+Uso (desde backend/):
+    python scripts/fake_redis.py --port 6390
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6390/0 uvicorn main:app --workers 2
+
+También se puede levantar dentro de un proceso de prueba:
+    server = FakeRedisServer(port=0); await server.start(); ... server.port ...; await server.stop()
+"""
+import argparse
+import asyncio
+import contextlib
+import time
+
+
+def _bulk(value: bytes | None) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _array(items: list[bytes]) -> bytes:
+    return b"*%d\r\n" % len(items) + b"".join(items)
+
+
+def _int(value: int) -> bytes:
+    return b":%d\r\n" % value
+
+
+OK = b"+OK\r\n"
+
+
+class FakeRedisServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 6390) -> None:
+        self.host = host
+        self.port = port
+        self._data: dict[bytes, tuple[float | None, bytes]] = {}
+        self._channels: dict[bytes, set[asyncio.StreamWriter]] = {}
+        # Versión por clave (sube con cada escritura) para WATCH
+        self._versions: dict[bytes, int] = {}
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        print(f"fake redis escuchando en {self.host}:{self.port}")
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    def _alive(self, key: bytes) -> bytes | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> list[bytes] | None:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()  # comandos inline (redis-cli / telnet)
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    def _touch(self, key: bytes) -> None:
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _transaction(self, args: list[bytes], writer: asyncio.StreamWriter, state: dict) -> bytes | None:
+        # WATCH / MULTI / EXEC de esta conexión; None si no es un comando de transacción
+        cmd = args[0].upper()
+        if cmd == b"WATCH":
+            for key in args[1:]:
+                state["watched"][key] = self._versions.get(key, 0)
+            return OK
+        if cmd == b"UNWATCH":
+            state["watched"].clear()
+            return OK
+        if cmd == b"MULTI":
+            state["queued"] = []
+            return OK
+        if cmd == b"DISCARD":
+            state["queued"] = None
+            state["watched"].clear()
+            return OK
+        if cmd == b"EXEC":
+            queued, state["queued"] = state["queued"] or [], None
+            changed = any(self._versions.get(k, 0) != v for k, v in state["watched"].items())
+            state["watched"].clear()
+            if changed:
+                return b"*-1\r\n"
+            return _array([self._dispatch(command, writer) for command in queued])
+        if state["queued"] is not None:
+            state["queued"].append(args)
+            return b"+QUEUED\r\n"
+        return None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        state: dict = {"watched": {}, "queued": None}
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                reply = self._transaction(args, writer, state)
+                writer.write(reply if reply is not None else self._dispatch(args, writer))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for subscribers in self._channels.values():
+                subscribers.discard(writer)
+            writer.close()
+
+    def _dispatch(self, args: list[bytes], writer: asyncio.StreamWriter) -> bytes:
+        cmd, rest = args[0].upper(), args[1:]
+        now = time.monotonic()
+        if cmd == b"PING":
+            return b"+PONG\r\n"
+        if cmd in (b"AUTH", b"SELECT"):
+            return OK
+        if cmd == b"GET":
+            return _bulk(self._alive(rest[0]))
+        if cmd == b"MGET":
+            return _array([_bulk(self._alive(key)) for key in rest])
+        if cmd == b"SET":
+            key, value, opts = rest[0], rest[1], [o.upper() for o in rest[2:]]
+            expires_at = None
+            if b"PX" in opts:
+                expires_at = now + int(rest[2 + opts.index(b"PX") + 1]) / 1000
+            elif b"EX" in opts:
+                expires_at = now + int(rest[2 + opts.index(b"EX") + 1])
+            exists = self._alive(key) is not None
+            if (b"NX" in opts and exists) or (b"XX" in opts and not exists):
+                return _bulk(None)
+            self._data[key] = (expires_at, value)
+            self._touch(key)
+            return OK
+        if cmd == b"DEL":
+            removed = 0
+            for key in rest:
+                if self._alive(key) is not None:
+                    del self._data[key]
+                    self._touch(key)
+                    removed += 1
+            return _int(removed)
+        if cmd == b"INCR":
+            current = self._alive(rest[0])
+            expires_at = self._data[rest[0]][0] if current is not None else None
+            value = int(current or 0) + 1
+            self._data[rest[0]] = (expires_at, str(value).encode())
+            self._touch(rest[0])
+            return _int(value)
+        if cmd == b"PEXPIRE":
+            current = self._alive(rest[0])
+            if current is None:
+                return _int(0)
+            self._data[rest[0]] = (now + int(rest[1]) / 1000, current)
+            self._touch(rest[0])
+            return _int(1)
+        if cmd == b"PTTL":
+            if self._alive(rest[0]) is None:
+                return _int(-2)
+            expires_at = self._data[rest[0]][0]
+            return _int(-1 if expires_at is None else int((expires_at - now) * 1000))
+        if cmd == b"PUBLISH":
+            channel, message = rest
+            subscribers = list(self._channels.get(channel, ()))
+            payload = _array([_bulk(b"message"), _bulk(channel), _bulk(message)])
+            for subscriber in subscribers:
+                subscriber.write(payload)
+            return _int(len(subscribers))
+        if cmd == b"SUBSCRIBE":
+            out = []
+            for i, channel in enumerate(rest, start=1):
+                self._channels.setdefault(channel, set()).add(writer)
+                out.append(_array([_bulk(b"subscribe"), _bulk(channel), _int(i)]))
+            return b"".join(out)
+        return b"-ERR unknown command '%s'\r\n" % cmd
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(FakeRedisServer(args.host, args.port).serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# scripts/import_marcas.py
+"""
+Importa marcas desde un fichero CSV/NDJSON (opcionalmente .gz) vía COPY.
+
+Lee el fichero por bloques, así que la memoria no depende de su tamaño.
+Imprime el informe (importadas, rechazadas y las primeras filas rechazadas).
+
+Uso (desde backend/):
+    python -m scripts.import_marcas registro.csv
+    python -m scripts.import_marcas registro.ndjson.gz --format ndjson
+"""
+import argparse
+import asyncio
+import sys
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from bd.session import AsyncSessionLocal
+from services.import_service import MarcaImportService
+
+BLOCK_SIZE = 1 << 20
+
+
+async def read_blocks(path: Path) -> AsyncIterator[bytes]:
+    with path.open("rb") as f:
+        while True:
+            block = await asyncio.to_thread(f.read, BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+
+
+async def run(path: Path, fmt: str) -> int:
+    service = MarcaImportService()
+    async with AsyncSessionLocal() as db:
+        report = await service.import_stream(
+            db, read_blocks(path), fmt=fmt, gzip=path.suffix == ".gz"
+        )
+    print(report.model_dump_json(indent=2))
+    return 0 if not report.rejected else 2
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=("csv", "ndjson"), default=None,
+                        help="Por defecto se deduce de la extensión")
+    args = parser.parse_args()
+    fmt = args.format
+    if fmt is None:
+        suffixes = [s.lstrip(".") for s in args.path.suffixes]
+        fmt = "ndjson" if "ndjson" in suffixes or "jsonl" in suffixes else "csv"
+    sys.exit(asyncio.run(run(args.path, fmt)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# scripts/reconcile_marca_stats.py
+"""
+Comprueba que marca_stats coincide con un recuento completo de marcas.
+
+Sin --fix solo informa y sale con código 1 si hay desviación.
+Con --fix reconstruye la tabla desde cero (bloquea escrituras en marcas
+mientras dura, las lecturas siguen) y vuelve a comprobar.
+
+Uso (desde backend/):
+    python -m scripts.reconcile_marca_stats
+    python -m scripts.reconcile_marca_stats --fix
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from bd.session import AsyncSessionLocal
+from repositories.metrics_repository import MetricsRepository
+
+
+async def run(fix: bool) -> int:
+    repo = MetricsRepository()
+    async with AsyncSessionLocal() as db:
+        drift = await repo.summary_drift(db)
+        await db.rollback()
+        print(json.dumps({"drift": drift}, indent=2))
+        if not drift or not fix:
+            return 1 if drift else 0
+        rows = await repo.rebuild_summary(db)
+        remaining = await repo.summary_drift(db)
+        print(json.dumps({"rebuilt_rows": rows, "drift_after": remaining}, indent=2))
+        return 1 if remaining else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fix", action="store_true", help="Reconstruir marca_stats si hay desviación")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.fix)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# app/services/feed_service.py
+import asyncio
+from collections.abc import Iterable
+from typing import Any
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bd.session import AsyncSessionLocal
+from core.config import settings
+from core.events import EventBus
+from core.events import event_bus as default_event_bus
+from models.index import Marca
+from schemas.Marca import Marca as MarcaSchema
+from services.metrics_service import MetricsService
+
+
+class ChangeFeed:
+    """
+    Publica en el feed SSE las escrituras de MarcaService:
+      - marca.created / marca.updated: snapshot de la marca
+      - marca.deleted: {"id"}
+      - marcas.<op>: {"ids": [...]} para operaciones masivas (troceado para NOTIFY)
+      - stats: resumen de /detalles + `delta` respecto al anterior, con debounce
+    Publicar nunca hace fallar la escritura que lo origina.
+    """
+
+    def __init__(
+        self,
+        bus: EventBus | None = None,
+        metrics: MetricsService | None = None,
+        session_factory: async_sessionmaker | None = None,
+    ) -> None:
+        self.bus = bus or default_event_bus
+        self.metrics = metrics or MetricsService()
+        self.session_factory = session_factory or AsyncSessionLocal
+        self._stats_task: asyncio.Task | None = None
+        self._stats_dirty = False
+        self._last_payload: dict[str, Any] | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def marca_changed(self, op: str, marca: Marca | MarcaSchema) -> None:
+        data = MarcaSchema.model_validate(marca).model_dump()
+        await self._publish(f"marca.{op}", data)
+
+    async def marca_deleted(self, marca_id: int) -> None:
+        await self._publish("marca.deleted", {"id": marca_id})
+
+    async def marcas_changed(self, op: str, ids: Iterable[int]) -> None:
+        ids = list(ids)
+        size = settings.EVENTS_BULK_IDS_PER_EVENT
+        for start in range(0, len(ids), size):
+            await self._publish(f"marcas.{op}", {"ids": ids[start:start + size]}, stats=False)
+        if ids:
+            self.stats_changed()
+
+    async def marcas_imported(self, imported: int) -> None:
+        # COPY no devuelve ids: solo el total
+        await self._publish("marcas.imported", {"imported": imported})
+
+    def stats_changed(self) -> None:
+        # Debounce: una ráfaga de escrituras produce un solo evento `stats`
+        self._stats_dirty = True
+        if self._stats_task is None or self._stats_task.done():
+            self._stats_task = asyncio.create_task(self._publish_stats())
+            self._tasks.add(self._stats_task)
+            self._stats_task.add_done_callback(self._tasks.discard)
+
+    async def _publish(self, type_: str, data: Any, *, stats: bool = True) -> None:
+        try:
+            await self.bus.publish(type_, data)
+        except Exception as e:
+            logger.warning("Feed: no se pudo publicar {} ({!r})", type_, e)
+        if stats:
+            self.stats_changed()
+
+    async def _publish_stats(self) -> None:
+        # Repite mientras lleguen escrituras durante el cálculo: ninguna se queda sin su `stats`
+        while self._stats_dirty:
+            await asyncio.sleep(settings.EVENTS_STATS_DEBOUNCE_SECONDS)
+            self._stats_dirty = False
+            await self._publish_stats_once()
+
+    async def _publish_stats_once(self) -> None:
+        try:
+            # La escritura ya invalidó la caché de /detalles: esto recalcula una vez
+            async with self.session_factory() as db:
+                payload = await self.metrics.get_stats_and_last3(db)
+            previous, self._last_payload = self._last_payload, payload
+            if payload == previous:
+                return
+            # delta por tarjeta respecto al último `stats` de este worker (None en el primero)
+            delta: dict[str, Any] | None = None
+            if previous is not None:
+                before = {item["title"]: item["value"] for item in previous["stats"]}
+                delta = {item["title"]: item["value"] - before.get(item["title"], 0) for item in payload["stats"]}
+            await self.bus.publish("stats", {**payload, "delta": delta})
+        except Exception as e:
+            logger.warning("Feed: no se pudo publicar stats ({!r})", e)
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+change_feed = ChangeFeed()
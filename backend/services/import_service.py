@@ -0,0 +1,173 @@
+# app/services/import_service.py
+import codecs
+import csv
+import zlib
+from collections.abc import AsyncIterator
+from typing import Any
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.cache import STATS_KEY, SharedCache
+from core.cache import stats_cache as default_stats_cache
+from core.config import settings
+from repositories.marca_repository import IMPORT_COLUMNS, MarcaRepository
+from schemas.Marca import ImportRejectedRow, ImportReport, MarcaCreate
+from services.feed_service import ChangeFeed
+from services.feed_service import change_feed as default_change_feed
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+async def _gunzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # wbits=47: acepta gzip o zlib, descomprime al vuelo
+    decompressor = zlib.decompressobj(47)
+    try:
+        async for chunk in chunks:
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+        tail = decompressor.flush()
+    except zlib.error as e:
+        raise ValueError(f"gzip inválido: {e}") from e
+    if tail:
+        yield tail
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[str]:
+    """Líneas UTF-8 (sin salto) a partir de bloques de bytes, sin cargar el fichero."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+        if len(pending) > max_line_bytes:
+            raise ValueError(f"Línea de más de {max_line_bytes} bytes")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+class MarcaImportService:
+    """
+    Importación masiva: valida contra MarcaCreate por bloques y carga las filas
+    válidas con COPY a una tabla temporal; al final un único INSERT ... SELECT
+    las pasa a `marcas` en la misma transacción (todo o nada para las válidas).
+    La memoria queda acotada por IMPORT_CHUNK_SIZE y el tope del informe de rechazos.
+    """
+
+    def __init__(
+        self,
+        repo: MarcaRepository | None = None,
+        stats_cache: SharedCache | None = None,
+        feed: ChangeFeed | None = None,
+    ) -> None:
+        self.repo = repo or MarcaRepository()
+        self.stats_cache = stats_cache or default_stats_cache
+        self.feed = feed or default_change_feed
+
+    async def import_stream(
+        self,
+        db: AsyncSession,
+        chunks: AsyncIterator[bytes],
+        *,
+        fmt: str,
+        gzip: bool = False,
+    ) -> ImportReport:
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"format inválido: {fmt}. Permitidos: {', '.join(IMPORT_FORMATS)}")
+        if gzip:
+            chunks = _gunzip(chunks)
+        lines = iter_lines(chunks, settings.IMPORT_MAX_LINE_BYTES)
+        records = self._csv_records(lines) if fmt == "csv" else self._ndjson_records(lines)
+
+        total = 0
+        rejected = 0
+        rejected_rows: list[ImportRejectedRow] = []
+        batch: list[tuple[str, str, str]] = []
+        await self.repo.start_import(db)
+        try:
+            async for line_no, data, error in records:
+                total += 1
+                if error is None:
+                    try:
+                        marca = MarcaCreate.model_validate(data)
+                        batch.append((marca.titulo, marca.nombre, marca.estado))
+                    except ValidationError as e:
+                        error = e.errors(include_url=False, include_context=False)
+                if error is not None:
+                    rejected += 1
+                    if len(rejected_rows) < settings.IMPORT_MAX_REJECTS_REPORTED:
+                        rejected_rows.append(ImportRejectedRow(line=line_no, errors=error))
+                if len(batch) >= settings.IMPORT_CHUNK_SIZE:
+                    await self.repo.copy_import_records(db, batch)
+                    batch = []
+            if batch:
+                await self.repo.copy_import_records(db, batch)
+            imported = await self.repo.finish_import(db)
+        except BaseException:
+            await db.rollback()
+            raise
+        if imported:
+            await self.stats_cache.invalidate(STATS_KEY)
+            await self.feed.marcas_imported(imported)
+        return ImportReport(
+            format=fmt,
+            total=total,
+            imported=imported,
+            rejected=rejected,
+            rejected_rows=rejected_rows,
+            rejected_truncated=rejected > len(rejected_rows),
+        )
+
+    async def _ndjson_records(
+        self, lines: AsyncIterator[str]
+    ) -> AsyncIterator[tuple[int, Any, list[dict[str, Any]] | None]]:
+        line_no = 0
+        async for line in lines:
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                yield line_no, orjson.loads(line), None
+            except orjson.JSONDecodeError as e:
+                yield line_no, None, [{"msg": f"JSON inválido: {e}"}]
+
+    async def _csv_records(
+        self, lines: AsyncIterator[str]
+    ) -> AsyncIterator[tuple[int, Any, list[dict[str, Any]] | None]]:
+        header: list[str] | None = None
+        line_no = 0
+        record: list[str] = []
+        start = 0
+        async for line in lines:
+            line_no += 1
+            if not record:
+                start = line_no
+            record.append(line)
+            joined = "\n".join(record)
+            # Un registro CSV termina cuando sus comillas están balanceadas
+            # (los campos entre comillas pueden contener saltos de línea)
+            if joined.count('"') % 2:
+                if len(joined) > settings.IMPORT_MAX_LINE_BYTES:
+                    raise ValueError(f"Registro CSV sin cerrar desde la línea {start}")
+                continue
+            record = []
+            if not joined.strip():
+                continue
+            fields = next(csv.reader([joined]))
+            if header is None:
+                header = [h.strip().lower() for h in fields]
+                missing = [c for c in IMPORT_COLUMNS if c not in header]
+                if missing:
+                    raise ValueError(f"Faltan columnas en la cabecera CSV: {', '.join(missing)}")
+                continue
+            if len(fields) != len(header):
+                yield start, None, [{"msg": f"Se esperaban {len(header)} columnas y hay {len(fields)}"}]
+                continue
+            yield start, dict(zip(header, fields, strict=True)), None
+        if record:
+            yield start, None, [{"msg": "Registro CSV con comillas sin cerrar"}]
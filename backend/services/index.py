@@ -1,42 +1,399 @@
-from typing import Optional, Sequence
-from sqlalchemy.ext.asyncio import AsyncSession
-from repositories.marca_repository import MarcaRepository
-from schemas.Marca import MarcaCreate , MarcaPatch
+import csv
+import io
+import zlib
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bd.session import primary_session
+from core.cache import (
+    ANALYTICS_GEN_KEY,
+    STATS_KEY,
+    SharedCache,
+)
+from core.cache import (
+    analytics_cache as default_analytics_cache,
+)
+from core.cache import (
+    marca_cache as default_marca_cache,
+)
+from core.cache import (
+    stats_cache as default_stats_cache,
+)
+from core.config import settings
 from models.index import Marca
+from repositories.marca_repository import LIST_COLUMNS, SEARCH_MODES, MarcaRepository
+from schemas.Marca import (
+    BulkItemResult,
+    BulkResult,
+    MarcaBulkPatch,
+    MarcaCreate,
+    MarcaPatch,
+)
+from schemas.Marca import (
+    Marca as MarcaSchema,
+)
+from services.feed_service import ChangeFeed
+from services.feed_service import change_feed as default_change_feed
+from utils.etag import PreconditionFailed, hash_etag
+from utils.pagination import decode_cursor, encode_cursor
 
 ALLOWED_ESTADOS = {"ACTIVA", "INACTIVA", "SUSPENDIDA"}
+EXPORT_FORMATS = ("ndjson", "csv")
+TOTAL_MODES = ("none", "exact", "estimate")
+
+
+@dataclass
+class MarcaPage:
+    """Página de GET /marcas/: filas como dicts listos para orjson (sin Pydantic)."""
+
+    items: list[dict[str, Any]]
+    next_cursor: str | None = None
+    total: int | None = None
+    total_exact: bool | None = None
+
 
 class MarcaService:
-    def __init__(self, repo: MarcaRepository | None = None) -> None:
-        self.repo = repo or MarcaRepository()   
+    def __init__(
+        self,
+        repo: MarcaRepository | None = None,
+        cache: SharedCache | None = None,
+        stats_cache: SharedCache | None = None,
+        feed: ChangeFeed | None = None,
+        analytics_cache: SharedCache | None = None,
+    ) -> None:
+        self.repo = repo or MarcaRepository()
+        self.cache = cache or default_marca_cache
+        self.stats_cache = stats_cache or default_stats_cache
+        self.feed = feed or default_change_feed
+        self.analytics_cache = analytics_cache or default_analytics_cache
 
     async def create_marca(self, db: AsyncSession, *, data: MarcaCreate) -> Marca:
         self._validate_estado(data.estado)
-        return await self.repo.create(db, data)
+        created = await self.repo.create(db, data)
+        await self._invalidate(created.id)
+        await self.feed.marca_changed("created", created)
+        return created
+
+    async def get_marca(self, db: AsyncSession, marca_id: int) -> MarcaSchema | None:
+        # Se cachea el snapshot Pydantic (no el objeto ORM, ligado a su sesión)
+        async def load() -> MarcaSchema | None:
+            async with primary_session(db) as session:
+                marca = await self.repo.get(session, marca_id)
+                return MarcaSchema.model_validate(marca) if marca else None
 
-    async def get_marca(self, db: AsyncSession, marca_id: int) -> Optional[Marca]:
-        return await self.repo.get(db, marca_id)
+        return await self.cache.get_or_load(marca_id, load)
 
     async def list_marcas(
-        self, db: AsyncSession, *, search: Optional[str], estado: Optional[str], limit: int, offset: int
+        self, db: AsyncSession, *, search: str | None, estado: str | None, limit: int, offset: int
     ) -> Sequence[Marca]:
         if estado:
             self._validate_estado(estado)
         return await self.repo.list(db, search=search, estado=estado, limit=limit, offset=offset)
 
+    async def list_marcas_page(
+        self,
+        db: AsyncSession,
+        *,
+        search: str | None,
+        estado: str | None,
+        limit: int,
+        offset: int = 0,
+        after: str | None = None,
+        match: str = "contains",
+        rank: bool = False,
+        total: str = "none",
+    ) -> MarcaPage:
+        """
+        Las filas traen solo las columnas de schemas.Marca para serializarlas sin
+        ORM ni Pydantic. Con `after` pagina por keyset sobre id; sin él mantiene el
+        modo offset. next_cursor es None en la última página y en resultados
+        ordenados por relevancia (no siguen el orden por id).
+
+        `total`: "exact" cuenta en la misma consulta de la página (COUNT(*) OVER());
+        "estimate" evita recorrer la tabla (ver _estimate_total).
+        """
+        if estado:
+            self._validate_estado(estado)
+        if match not in SEARCH_MODES:
+            raise ValueError(f"match inválido: {match}. Permitidos: {', '.join(SEARCH_MODES)}")
+        if total not in TOTAL_MODES:
+            raise ValueError(f"total inválido: {total}. Permitidos: {', '.join(TOTAL_MODES)}")
+        if total == "exact" and after is not None:
+            # Con keyset la ventana solo ve las filas posteriores al cursor
+            raise ValueError("total=exact no se puede combinar con 'after' (usar total=estimate)")
+        rank = rank and bool(search)
+        after_id = None
+        if after is not None:
+            if offset:
+                raise ValueError("No se puede combinar 'after' con 'offset'")
+            if rank:
+                raise ValueError("No se puede combinar 'after' con 'rank'")
+            after_id = decode_cursor(after)
+        # Pedimos una fila extra para saber si hay siguiente página
+        marcas = await self.repo.list_rows(
+            db,
+            search=search,
+            estado=estado,
+            limit=limit + 1,
+            offset=offset,
+            after_id=after_id,
+            match=match,
+            rank=rank,
+            with_total=total == "exact",
+        )
+        items = [row._asdict() for row in marcas[:limit]]
+        result = MarcaPage(items=items)
+        if len(marcas) > limit and not rank:
+            result.next_cursor = encode_cursor(items[-1]["id"])
+        if total == "exact":
+            for item in items:
+                result.total = item.pop("total")
+            if result.total is None:
+                # Página vacía (offset más allá del final): la ventana no devolvió nada
+                result.total = 0 if not offset else await self.repo.count(
+                    db, search=search, estado=estado, match=match
+                )
+            result.total_exact = True
+        elif total == "estimate":
+            result.total, result.total_exact = await self._estimate_total(
+                db, search=search, estado=estado, match=match
+            )
+        return result
+
+    async def _estimate_total(
+        self, db: AsyncSession, *, search: str | None, estado: str | None, match: str
+    ) -> tuple[int, bool]:
+        # Sin búsqueda, marca_stats da el exacto en O(1); si no, estimación del planificador
+        if not search and settings.STATS_SUMMARY_ENABLED:
+            return await self.repo.summary_count(db, estado=estado), True
+        if (await db.connection()).dialect.name != "postgresql":
+            return await self.repo.count(db, search=search, estado=estado, match=match), True
+        return await self.repo.estimate_count(db, search=search, estado=estado, match=match), False
+
+    async def list_etag(
+        self,
+        db: AsyncSession,
+        *,
+        search: str | None,
+        estado: str | None,
+        match: str = "contains",
+        page_key: str = "",
+    ) -> str:
+        """
+        ETag de una página de GET /marcas/: versión de la colección (total +
+        contador de marcas_version, O(1); ver collection_version) más los
+        parámetros de la página (`page_key`, que incluye los filtros). Permite
+        responder 304 sin traer ni serializar filas.
+        """
+        if estado:
+            self._validate_estado(estado)
+        if match not in SEARCH_MODES:
+            raise ValueError(f"match inválido: {match}. Permitidos: {', '.join(SEARCH_MODES)}")
+        total, version = await self.repo.collection_version(db, summary=settings.STATS_SUMMARY_ENABLED)
+        return hash_etag(total, version, page_key)
+
+    def export_marcas(
+        self,
+        session_factory: async_sessionmaker,
+        *,
+        fmt: str,
+        search: str | None = None,
+        estado: str | None = None,
+        match: str = "contains",
+        gzip: bool = False,
+    ) -> AsyncIterator[bytes]:
+        """
+        Valida ya (antes de enviar cabeceras) y devuelve un iterador de bytes que
+        abre su propia sesión y vuelca la tabla por lotes desde un cursor de servidor.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"format inválido: {fmt}. Permitidos: {', '.join(EXPORT_FORMATS)}")
+        if estado:
+            self._validate_estado(estado)
+        if match not in SEARCH_MODES:
+            raise ValueError(f"match inválido: {match}. Permitidos: {', '.join(SEARCH_MODES)}")
+        chunks = self._export_chunks(session_factory, fmt=fmt, search=search, estado=estado, match=match)
+        return self._gzip(chunks) if gzip else chunks
+
+    async def _export_chunks(
+        self,
+        session_factory: async_sessionmaker,
+        *,
+        fmt: str,
+        search: str | None,
+        estado: str | None,
+        match: str,
+    ) -> AsyncIterator[bytes]:
+        columns = [c.key for c in LIST_COLUMNS]
+        if fmt == "csv":
+            yield self._csv_lines([columns])
+        async with session_factory() as db:
+            batches = self.repo.stream_rows(
+                db, search=search, estado=estado, match=match, batch_size=settings.EXPORT_BATCH_SIZE
+            )
+            async for rows in batches:
+                if fmt == "csv":
+                    yield self._csv_lines(rows)
+                else:
+                    yield b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows)
+
+    def _csv_lines(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
+
+    async def _gzip(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        # wbits=31: contenedor gzip, comprimido al vuelo lote a lote
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
     async def update_marca(
         self,
         db: AsyncSession,
         marca_id: int,
         *,
-        changes: MarcaPatch
-    ) -> Optional[Marca]:
+        changes: MarcaPatch,
+        if_match: list[datetime] | None = None,
+    ) -> Marca | None:
+        """`if_match`: versiones (updated_at) aceptadas; PreconditionFailed si la marca cambió."""
         if changes.estado:
             self._validate_estado(changes.estado)
-        return await self.repo.update(db, marca_id, changes)
+        updated = await self.repo.update(db, marca_id, changes, if_updated_at=if_match)
+        if updated is None and if_match is not None:
+            await self._check_precondition(db, marca_id)
+        await self._invalidate(marca_id)
+        if updated is not None and changes.estado:
+            await self._invalidate_analytics()
+        if updated is not None and changes.model_dump(exclude_none=True):
+            await self.feed.marca_changed("updated", updated)
+        return updated
+
+    async def delete_marca(
+        self, db: AsyncSession, marca_id: int, *, if_match: list[datetime] | None = None
+    ) -> bool:
+        deleted = await self.repo.delete(db, marca_id, if_updated_at=if_match)
+        if not deleted and if_match is not None:
+            await self._check_precondition(db, marca_id)
+        await self._invalidate(marca_id)
+        if deleted:
+            await self._invalidate_analytics()
+            await self.feed.marca_deleted(marca_id)
+        return deleted
+
+    async def _check_precondition(self, db: AsyncSession, marca_id: int) -> None:
+        # La escritura condicional no tocó nada: 412 si la marca existe (otra versión), 404 si no
+        if await self.repo.get(db, marca_id) is not None:
+            raise PreconditionFailed("La marca fue modificada (If-Match no coincide)")
+
+    async def bulk_create_marcas(self, db: AsyncSession, items: list[Any]) -> BulkResult:
+        self._validate_bulk_size(items)
+        results, valid = self._validate_items(items, MarcaCreate)
+        if valid:
+            created = await self.repo.bulk_create(db, [item for _, item in valid])
+            for (index, _), marca in zip(valid, created, strict=True):
+                results[index] = self._ok(index, marca)
+            await self._invalidate(*(marca.id for marca in created))
+            await self.feed.marcas_changed("created", (marca.id for marca in created))
+        return self._bulk_result(results)
+
+    async def bulk_update_marcas(self, db: AsyncSession, items: list[Any]) -> BulkResult:
+        self._validate_bulk_size(items)
+        results, valid = self._validate_items(items, MarcaBulkPatch)
+        # Un id repetido haría el UPDATE ... FROM no determinista: gana la primera aparición
+        seen: dict[int, int] = {}
+        unique: list[tuple[int, MarcaBulkPatch]] = []
+        for index, item in valid:
+            if item.id in seen:
+                results[index] = self._error(index, f"id {item.id} repetido (ver item {seen[item.id]})", item.id)
+                continue
+            seen[item.id] = index
+            unique.append((index, item))
+        if unique:
+            updated = await self.repo.bulk_update(
+                db, [item for _, item in unique], chunk_size=settings.BULK_CHUNK_SIZE
+            )
+            await self._invalidate(*(item.id for _, item in unique))
+            if any(item.estado for _, item in unique):
+                await self._invalidate_analytics()
+            await self.feed.marcas_changed("updated", (marca.id for marca in updated))
+            by_id = {marca.id: marca for marca in updated}
+            for index, item in unique:
+                marca = by_id.get(item.id)
+                results[index] = (
+                    self._ok(index, marca) if marca else self._error(index, "Marca Not Found", item.id)
+                )
+        return self._bulk_result(results)
+
+    async def bulk_delete_marcas(self, db: AsyncSession, ids: list[int]) -> BulkResult:
+        self._validate_bulk_size(ids)
+        deleted = set(await self.repo.bulk_delete(db, list(set(ids)))) if ids else set()
+        await self._invalidate(*deleted)
+        if deleted:
+            await self._invalidate_analytics()
+        await self.feed.marcas_changed("deleted", sorted(deleted))
+        results = [
+            BulkItemResult(index=index, ok=True, id=marca_id)
+            if marca_id in deleted
+            else self._error(index, "Marca Not Found", marca_id)
+            for index, marca_id in enumerate(ids)
+        ]
+        return self._bulk_result(results)
+
+    async def _invalidate(self, *marca_ids: int) -> None:
+        # Tras cada escritura: fuera las marcas afectadas y el resumen de /detalles
+        await self.cache.invalidate(*marca_ids)
+        await self.stats_cache.invalidate(STATS_KEY)
+
+    async def _invalidate_analytics(self) -> None:
+        # Bajas y cambios de estado alteran buckets ya cerrados de /detalles/series:
+        # nueva generación = todos los buckets cacheados quedan huérfanos (expiran por TTL)
+        await self.analytics_cache.invalidate(ANALYTICS_GEN_KEY)
+
+    def _validate_bulk_size(self, items: list[Any]) -> None:
+        if len(items) > settings.BULK_MAX_ITEMS:
+            raise ValueError(f"Máximo {settings.BULK_MAX_ITEMS} items por petición")
+
+    def _validate_items(
+        self, items: list[Any], model: type[MarcaCreate] | type[MarcaBulkPatch]
+    ) -> tuple[list[BulkItemResult | None], list[tuple[int, Any]]]:
+        # Cada item se valida por separado: los inválidos no frenan al resto
+        results: list[BulkItemResult | None] = [None] * len(items)
+        valid: list[tuple[int, Any]] = []
+        for index, raw in enumerate(items):
+            try:
+                item = model.model_validate(raw)
+                if item.estado:
+                    self._validate_estado(item.estado)
+            except ValidationError as e:
+                results[index] = BulkItemResult(
+                    index=index, ok=False, errors=e.errors(include_url=False, include_context=False)
+                )
+                continue
+            except ValueError as e:
+                results[index] = self._error(index, str(e))
+                continue
+            valid.append((index, item))
+        return results, valid
+
+    def _ok(self, index: int, marca: Marca) -> BulkItemResult:
+        return BulkItemResult(index=index, ok=True, id=marca.id, marca=MarcaSchema.model_validate(marca))
+
+    def _error(self, index: int, msg: str, marca_id: int | None = None) -> BulkItemResult:
+        return BulkItemResult(index=index, ok=False, id=marca_id, errors=[{"msg": msg}])
 
-    async def delete_marca(self, db: AsyncSession, marca_id: int) -> bool:
-        return await self.repo.delete(db, marca_id)
+    def _bulk_result(self, results: list[BulkItemResult | None]) -> BulkResult:
+        ok = sum(1 for r in results if r and r.ok)
+        return BulkResult(total=len(results), ok=ok, failed=len(results) - ok, results=results)
 
     def _validate_estado(self, estado: str) -> None:
         if estado not in ALLOWED_ESTADOS:
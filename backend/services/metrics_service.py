@@ -1,30 +1,181 @@
 # app/services/metrics_service.py
-from typing import Dict, Any
+import uuid
+from contextlib import nullcontext
+from datetime import UTC, date, datetime, time, timedelta
+from typing import Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from repositories.metrics_repository import MetricsRepository
-from datetime import datetime, timezone
+
+from bd.session import primary_session
+from core.cache import (
+    ANALYTICS_GEN_KEY,
+    STATS_KEY,
+    SharedCache,
+)
+from core.cache import (
+    analytics_cache as default_analytics_cache,
+)
+from core.cache import (
+    stats_cache as default_stats_cache,
+)
+from core.config import settings
+from repositories.metrics_repository import SERIES_COLUMNS, MetricsRepository
+
+GRANULARITIES = ("day", "week", "month")
+
+
+def _bucket_start(day: date, granularity: str) -> date:
+    # Igual que date_trunc de PostgreSQL (semanas ISO: empiezan en lunes)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
 
 class MetricsService:
-    def __init__(self, repo: MetricsRepository | None = None) -> None:
+    def __init__(
+        self,
+        repo: MetricsRepository | None = None,
+        cache: SharedCache | None = None,
+        analytics_cache: SharedCache | None = None,
+    ) -> None:
         self.repo = repo or MetricsRepository()
+        self.cache = cache or default_stats_cache
+        self.analytics_cache = analytics_cache or default_analytics_cache
+        self._month_bounds: tuple[datetime, datetime] | None = None
 
     def _month_bounds_utc(self) -> tuple[datetime, datetime]:
-        now = datetime.now(timezone.utc)
-        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        # calcular primer día del siguiente mes
-        if start.month == 12:
-            next_month = start.replace(year=start.year + 1, month=1)
-        else:
-            next_month = start.replace(month=start.month + 1)
-        return start, next_month
+        # Se recalcula solo al cambiar de mes
+        now = datetime.now(UTC)
+        if self._month_bounds is None or now >= self._month_bounds[1]:
+            start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            # calcular primer día del siguiente mes
+            if start.month == 12:
+                next_month = start.replace(year=start.year + 1, month=1)
+            else:
+                next_month = start.replace(month=start.month + 1)
+            self._month_bounds = (start, next_month)
+        return self._month_bounds
+
+    async def get_series(
+        self,
+        db: AsyncSession,
+        *,
+        metric: str,
+        granularity: str,
+        tz: str,
+        desde: date | None = None,
+        hasta: date | None = None,
+    ) -> dict[str, Any]:
+        """
+        Totales por día/semana/mes (en la zona `tz`) entre `desde` y `hasta`, ambos
+        incluidos y ampliados a buckets completos (por defecto, los últimos 30 días).
+        Los buckets ya cerrados se cachean uno a uno: en una serie repetida solo se
+        consulta el bucket en curso. Borrar marcas o cambiarles el estado invalida todo
+        (MarcaService sube la generación).
+        """
+        if metric not in SERIES_COLUMNS:
+            raise ValueError(f"métrica inválida: {metric}. Permitidas: {', '.join(SERIES_COLUMNS)}")
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularidad inválida: {granularity}. Permitidas: {', '.join(GRANULARITIES)}")
+        try:
+            zone = ZoneInfo(tz)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Zona horaria desconocida: {tz}") from None
+        today = datetime.now(zone).date()
+        hasta = hasta or today
+        desde = desde or hasta - timedelta(days=30)
+        if hasta < desde:
+            raise ValueError("'hasta' debe ser posterior a 'desde'")
+
+        buckets: list[date] = []
+        start = _bucket_start(desde, granularity)
+        while start <= hasta:
+            buckets.append(start)
+            if len(buckets) > settings.ANALYTICS_MAX_BUCKETS:
+                raise ValueError(f"Máximo {settings.ANALYTICS_MAX_BUCKETS} buckets por serie")
+            start = _next_bucket(start, granularity)
+
+        gen = await self.analytics_cache.get_or_load(ANALYTICS_GEN_KEY, self._new_generation)
+        keys = {b: f"{gen}:{metric}:{granularity}:{tz}:{b.isoformat()}" for b in buckets}
+        closed = {b for b in buckets if _next_bucket(b, granularity) <= today}
+        totals: dict[date, int] = {}
+        cached = await self.analytics_cache.get_many([keys[b] for b in buckets if b in closed])
+        for b in buckets:
+            if keys[b] in cached:
+                totals[b] = cached[keys[b]]
+        # Buckets futuros: 0 sin consultar
+        pending = [b for b in buckets if b not in totals and b <= today]
+        if pending:
+            # Una sola consulta agrupada que cubre todos los que faltan
+            start_local = pending[0]
+            end_local = _next_bucket(pending[-1], granularity)
+            # Los cerrados se cachean: esos, del primario; solo el actual puede ir a réplica
+            source = primary_session(db) if any(b in closed for b in pending) else nullcontext(db)
+            async with source as session:
+                rows = await self.repo.bucket_counts(
+                    session,
+                    metric=metric,
+                    granularity=granularity,
+                    tz=tz,
+                    start=datetime.combine(start_local, time(), zone),
+                    end=datetime.combine(end_local, time(), zone),
+                )
+            counted = {bucket.date(): total for bucket, total in rows}
+            for b in pending:
+                totals[b] = counted.get(b, 0)
+            await self.analytics_cache.set_many(
+                {keys[b]: totals[b] for b in pending if b in closed}
+            )
+        series = [{"bucket": b.isoformat(), "total": totals.get(b, 0)} for b in buckets]
+        return {
+            "metrica": metric,
+            "granularidad": granularity,
+            "tz": tz,
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "total": sum(item["total"] for item in series),
+            "series": series,
+        }
 
-    async def get_stats_and_last3(self, db: AsyncSession) -> Dict[str, Any]:
-        total = await self.repo.total_marcas(db)
-        pendientes = await self.repo.count_pendientes(db)
-        vencimientos = await self.repo.count_vencimientos(db)
+    async def _new_generation(self) -> str:
+        return uuid.uuid4().hex[:12]
+
+    async def get_stats_and_last3(self, db: AsyncSession) -> dict[str, Any]:
+        # MarcaService invalida STATS_KEY en cada escritura
+        async def load() -> dict[str, Any]:
+            async with primary_session(db) as session:
+                return await self.compute_stats(session)
+
+        return await self.cache.get_or_load(STATS_KEY, load)
+
+    async def compute_stats(self, db: AsyncSession) -> dict[str, Any]:
+        # Sin caché: lo usan get_stats_and_last3 y el warm-up del pool (bd/warmup.py)
         start_m, next_m = self._month_bounds_utc()
-        aprobadas_mes = await self.repo.count_aprobadas_este_mes(db, start_month=start_m, next_month=next_m)
-        ultimas = await self.repo.last_n_marcas(db, n=3)
+        if settings.STATS_SUMMARY_ENABLED:
+            # Contadores de marca_stats (mantenidos por triggers): no recorre marcas
+            counters, ultimas = await self.repo.summary_stats_and_last_n(
+                db, month_key=start_m.strftime("%Y-%m"), n=3
+            )
+        else:
+            counters, ultimas = await self.repo.stats_and_last_n(
+                db, start_month=start_m, next_month=next_m, n=3
+            )
+        total = counters["total"]
+        pendientes = counters["pendientes"]
+        # Vencimientos = INACTIVAS, mismo contador que pendientes
+        vencimientos = pendientes
+        aprobadas_mes = counters["aprobadas_mes"]
 
         stats = [
             {
@@ -50,8 +201,8 @@ class MetricsService:
         ]
 
         ultimas_3 = [
-            {"id": marca.id, "titulo": marca.titulo, "nombre": marca.nombre, "estado": marca.estado}
-            for marca in ultimas
+            {"id": row["id"], "titulo": row["titulo"], "nombre": row["nombre"], "estado": row["estado"]}
+            for row in ultimas
         ]
 
         return {"stats": stats, "ultimas_registradas": ultimas_3}
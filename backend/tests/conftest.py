@@ -0,0 +1,48 @@
+# tests/conftest.py
+import asyncio
+import os
+import pathlib
+
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from bd.session import build_engine
+
+BACKEND_DIR = pathlib.Path(__file__).resolve().parents[1]
+# Las pruebas contra Postgres solo corren con una BD de pruebas explícita (nunca la
+# de settings, que es la de producción). Ej.: postgresql+asyncpg://u:p@localhost/marcas_test
+# (con DB_SSL=false si el servidor local no tiene SSL)
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+def _upgrade(connection) -> None:
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
+@pytest.fixture(scope="session")
+def postgres_url() -> str:
+    """TEST_DATABASE_URL migrada a head; salta la prueba si no está definida."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL no definida")
+
+    async def migrate() -> None:
+        engine = build_engine(TEST_DATABASE_URL)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(_upgrade)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(migrate())
+    return TEST_DATABASE_URL
+
+
+@pytest.fixture
+async def pg_engine(postgres_url):
+    engine = build_engine(postgres_url, pool_size=20, max_overflow=0)
+    yield engine
+    await engine.dispose()
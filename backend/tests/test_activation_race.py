@@ -0,0 +1,58 @@
+# tests/test_activation_race.py
+"""approved_at de MarcaRepository.update contra Postgres (TEST_DATABASE_URL)."""
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from repositories.marca_repository import MarcaRepository
+from schemas.Marca import MarcaCreate, MarcaPatch
+
+CONCURRENCY = 10
+repo = MarcaRepository()
+
+
+@pytest.fixture
+async def session_factory(pg_engine):
+    return async_sessionmaker(pg_engine, expire_on_commit=False, autoflush=False)
+
+
+@pytest.fixture
+async def marca(session_factory):
+    async with session_factory() as db:
+        created = await repo.create(db, MarcaCreate(titulo="race", nombre="race", estado="INACTIVA"))
+    yield created
+    async with session_factory() as db:
+        await repo.delete(db, created.id)
+
+
+async def patch(session_factory, marca_id: int, changes: MarcaPatch):
+    async with session_factory() as db:
+        return await repo.update(db, marca_id, changes)
+
+
+async def test_concurrent_activations_keep_first_approved_at(session_factory, marca):
+    assert marca.approved_at is None
+
+    results = await asyncio.gather(
+        *(patch(session_factory, marca.id, MarcaPatch(estado="ACTIVA")) for _ in range(CONCURRENCY))
+    )
+    async with session_factory() as db:
+        final = await repo.get(db, marca.id)
+
+    assert final.estado == "ACTIVA"
+    assert final.approved_at is not None
+    assert {r.approved_at for r in results} == {final.approved_at}
+
+
+async def test_approved_at_survives_reactivation(session_factory, marca):
+    untouched = await patch(session_factory, marca.id, MarcaPatch(titulo="otro"))
+    assert untouched.approved_at is None
+
+    first = await patch(session_factory, marca.id, MarcaPatch(estado="ACTIVA"))
+    again = await patch(session_factory, marca.id, MarcaPatch(estado="ACTIVA"))
+    inactive = await patch(session_factory, marca.id, MarcaPatch(estado="INACTIVA"))
+    reactivated = await patch(session_factory, marca.id, MarcaPatch(estado="ACTIVA"))
+
+    assert first.approved_at is not None
+    assert again.approved_at == inactive.approved_at == reactivated.approved_at == first.approved_at
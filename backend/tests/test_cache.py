@@ -0,0 +1,166 @@
+# tests/test_cache.py
+import asyncio
+
+import pytest
+
+from core.cache import SharedCache
+from core.cache_backend import MemoryBackend, RedisBackend
+from scripts.fake_redis import FakeRedisServer
+
+
+@pytest.fixture
+async def redis_url():
+    server = FakeRedisServer(port=0)
+    await server.start()
+    yield f"redis://127.0.0.1:{server.port}/0"
+    await server.stop()
+
+
+@pytest.fixture
+async def backends(redis_url):
+    # Un RedisBackend por "worker", como en producción
+    opened = [RedisBackend(redis_url), RedisBackend(redis_url), RedisBackend(redis_url)]
+    yield opened
+    for backend in opened:
+        await backend.close()
+
+
+def make_cache(backend) -> SharedCache:
+    return SharedCache("prueba", ttl=60, maxsize=100, backend=backend)
+
+
+def loader(value, calls: list):
+    async def load():
+        calls.append(value)
+        return value
+
+    return load
+
+
+async def wait_until(predicate, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timeout esperando la condición"
+        await asyncio.sleep(0.01)
+
+
+async def test_invalidate_propagates_between_workers(backends):
+    a, b = make_cache(backends[0]), make_cache(backends[1])
+    calls: list = []
+
+    assert await a.get_or_load(1, loader({"v": 1}, calls)) == {"v": 1}
+    # b lo encuentra en el backend compartido sin cargar
+    assert await b.get_or_load(1, loader({"v": 0}, calls)) == {"v": 1}
+    assert calls == [{"v": 1}]
+    assert b.l1.get(1) == {"v": 1}
+
+    await a.invalidate(1)
+    await wait_until(lambda: b.l1.get(1) is None)
+    assert await b.get_or_load(1, loader({"v": 2}, calls)) == {"v": 2}
+    assert await a.get_or_load(1, loader({"v": 3}, calls)) == {"v": 2}
+
+
+async def _stale_load(cache: SharedCache, invalidate) -> None:
+    # Carga en curso con el valor viejo; el invalidate llega antes de que termine
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_loader():
+        started.set()
+        await release.wait()
+        return {"v": "viejo"}
+
+    task = asyncio.create_task(cache.get_or_load(7, slow_loader))
+    await started.wait()
+    await invalidate()
+    release.set()
+    assert await task == {"v": "viejo"}  # quien pidió antes del invalidate recibe lo que había
+
+
+@pytest.mark.parametrize("shared", ["memory", "redis"])
+async def test_invalidate_during_load_same_worker(shared, backends):
+    backend = MemoryBackend() if shared == "memory" else backends[0]
+    a = make_cache(backend)
+    await _stale_load(a, lambda: a.invalidate(7))
+
+    calls: list = []
+    assert a.l1.get(7) is None
+    assert await a.get_or_load(7, loader({"v": "nuevo"}, calls)) == {"v": "nuevo"}
+    # Otro worker tampoco ve el valor viejo en el backend
+    other = make_cache(backend if shared == "memory" else backends[1])
+    assert await other.get_or_load(7, loader({"v": "otro"}, calls)) == {"v": "nuevo"}
+
+
+async def test_invalidate_from_other_worker_during_load(backends):
+    a, b, c = (make_cache(backend) for backend in backends)
+    # El aviso de b no llega a tiempo a `a` (pub/sub es asíncrono): su carga termina y escribe
+    a._subscribed = True
+    await _stale_load(a, lambda: b.invalidate(7))
+    assert await backends[2].get(a.key(7)) is not None
+
+    # Lo escribió después del borrado de b, pero con la generación anterior: no vale
+    calls: list = []
+    assert await c.get_or_load(7, loader({"v": "nuevo"}, calls)) == {"v": "nuevo"}
+    assert calls == [{"v": "nuevo"}]
+    assert c.stale_discarded == 1
+
+
+class HoldingProxy:
+    """Proxy TCP hacia el servidor que retiene sus respuestas mientras `release` no está puesto."""
+
+    def __init__(self, upstream_port: int) -> None:
+        self.upstream_port = upstream_port
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.server.close()
+
+    async def _handle(self, reader, writer) -> None:
+        up_reader, up_writer = await asyncio.open_connection("127.0.0.1", self.upstream_port)
+
+        async def pipe(src, dst, hold: bool) -> None:
+            while data := await src.read(65536):
+                if hold:
+                    await self.release.wait()
+                dst.write(data)
+                await dst.drain()
+            dst.close()
+
+        await asyncio.gather(
+            pipe(reader, up_writer, False), pipe(up_reader, writer, True), return_exceptions=True
+        )
+
+
+@pytest.mark.parametrize("operation", ["get", "compare_and_set"])
+async def test_cancelled_command_does_not_desync_connection(redis_url, operation):
+    direct = RedisBackend(redis_url)
+    await direct.set("a", b"A", 60)
+    await direct.set("b", b"B", 60)
+    proxy = HoldingProxy(int(redis_url.rsplit(":", 1)[1].split("/")[0]))
+    await proxy.start()
+    backend = RedisBackend(f"redis://127.0.0.1:{proxy.port}/0")
+    try:
+        assert await backend.get("b") == b"B"  # conexión ya abierta
+
+        proxy.release.clear()
+        if operation == "get":
+            task = asyncio.create_task(backend.get("a"))
+        else:
+            task = asyncio.create_task(backend.compare_and_set("a", b"A", b"A2", 60))
+        await asyncio.sleep(0.05)  # el comando llegó al servidor; su respuesta está retenida
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        proxy.release.set()
+
+        # La respuesta pendiente no puede acabar en la siguiente llamada
+        assert await backend.get("b") == b"B"
+        assert await backend.get("a") in (b"A", b"A2")
+    finally:
+        await backend.close()
+        await direct.close()
+        await proxy.stop()
@@ -0,0 +1,189 @@
+# tests/test_idempotency.py
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from core.cache_backend import MemoryBackend, RedisBackend
+from core.config import settings
+from core.idempotency import IdempotencyMiddleware
+from scripts.fake_redis import FakeRedisServer
+
+
+def make_app(calls: list, *, delay: float = 0.0, fail_first: bool = False) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/marcas")
+    async def crear(payload: dict):
+        calls.append(payload)
+        await asyncio.sleep(delay)
+        if fail_first and len(calls) == 1:
+            return JSONResponse({"detail": "fallo"}, status_code=500)
+        return {"id": len(calls), **payload}
+
+    return app
+
+
+def make_client(app, backend) -> httpx.AsyncClient:
+    transport = httpx.ASGITransport(app=IdempotencyMiddleware(app, backend=backend))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def key(value: str) -> dict:
+    return {settings.IDEMPOTENCY_HEADER: value}
+
+
+async def test_replay_returns_stored_response():
+    calls: list = []
+    async with make_client(make_app(calls), MemoryBackend(maxsize=None)) as client:
+        first = await client.post("/marcas", json={"titulo": "a"}, headers=key("k1"))
+        second = await client.post("/marcas", json={"titulo": "a"}, headers=key("k1"))
+        other = await client.post("/marcas", json={"titulo": "a"}, headers=key("k2"))
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json() == {"id": 1, "titulo": "a"}
+    assert second.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert other.json()["id"] == 2
+    assert len(calls) == 2
+
+
+async def test_same_key_other_body_is_422():
+    calls: list = []
+    async with make_client(make_app(calls), MemoryBackend(maxsize=None)) as client:
+        await client.post("/marcas", json={"titulo": "a"}, headers=key("k1"))
+        reused = await client.post("/marcas", json={"titulo": "b"}, headers=key("k1"))
+
+    assert reused.status_code == 422
+    assert len(calls) == 1
+
+
+async def test_concurrent_duplicates_run_once():
+    calls: list = []
+    async with make_client(make_app(calls, delay=0.1), MemoryBackend(maxsize=None)) as client:
+        responses = await asyncio.gather(
+            *(client.post("/marcas", json={"titulo": "a"}, headers=key("k1")) for _ in range(5))
+        )
+
+    assert len(calls) == 1
+    assert {r.status_code for r in responses} == {200}
+    assert all(r.json() == {"id": 1, "titulo": "a"} for r in responses)
+    assert sum(r.headers.get("idempotent-replayed") == "true" for r in responses) == 4
+
+
+async def test_server_error_releases_key():
+    calls: list = []
+    async with make_client(make_app(calls, fail_first=True), MemoryBackend(maxsize=None)) as client:
+        failed = await client.post("/marcas", json={"titulo": "a"}, headers=key("k1"))
+        retried = await client.post("/marcas", json={"titulo": "a"}, headers=key("k1"))
+
+    assert failed.status_code == 500
+    assert retried.status_code == 200
+    assert "idempotent-replayed" not in retried.headers
+    assert len(calls) == 2
+
+
+async def test_claim_is_renewed_while_running(monkeypatch):
+    # Dos "workers" con el mismo backend: el duplicado solo puede sondear, y la
+    # primera petición tarda varias veces el TTL de la reserva
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_TTL_SECONDS", 0.3)
+    calls: list = []
+    backend = MemoryBackend(maxsize=None)
+    app = make_app(calls, delay=1.0)
+    async with make_client(app, backend) as worker_a, make_client(app, backend) as worker_b:
+        first = asyncio.create_task(worker_a.post("/marcas", json={"titulo": "a"}, headers=key("k1")))
+        await asyncio.sleep(0.6)
+        duplicate = await worker_b.post("/marcas", json={"titulo": "a"}, headers=key("k1"))
+        original = await first
+
+    assert len(calls) == 1
+    assert duplicate.json() == original.json()
+    assert duplicate.headers["idempotent-replayed"] == "true"
+
+
+class SlowRenewalBackend(MemoryBackend):
+    """Renovaciones lentas (compare_and_set del valor sobre sí mismo); anota si las cancelan."""
+
+    def __init__(self) -> None:
+        super().__init__(maxsize=None)
+        self.renewals = 0
+        self.cancelled = 0
+
+    async def compare_and_set(self, key: str, expected: bytes, value: bytes, ttl: float) -> bool:
+        renewed = await super().compare_and_set(key, expected, value, ttl)
+        if value == expected:
+            # Respuesta lenta: la renovación ya se aplicó pero aún no ha vuelto
+            self.renewals += 1
+            try:
+                await asyncio.sleep(0.2)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        return renewed
+
+
+async def test_heartbeat_is_not_cancelled_mid_renewal(monkeypatch):
+    # La petición termina mientras hay una renovación en vuelo: se espera, no se cancela
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_TTL_SECONDS", 0.3)
+    calls: list = []
+    backend = SlowRenewalBackend()
+    async with make_client(make_app(calls, delay=0.15), backend) as client:
+        first = await client.post("/marcas", json={"titulo": "a"}, headers=key("k1"))
+        second = await client.post("/marcas", json={"titulo": "a"}, headers=key("k1"))
+
+    assert backend.renewals == 1
+    assert backend.cancelled == 0
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.json() == first.json()
+    assert len(calls) == 1
+
+
+async def test_large_body_is_413(monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_MAX_BODY_BYTES", 64)
+    calls: list = []
+
+    async def chunked():
+        for _ in range(10):
+            yield b"x" * 16
+
+    async with make_client(make_app(calls), MemoryBackend(maxsize=None)) as client:
+        declared = await client.post("/marcas", json={"titulo": "a" * 100}, headers=key("k1"))
+        streamed = await client.post("/marcas", content=chunked(), headers=key("k2"))
+        without_key = await client.post("/marcas", json={"titulo": "a" * 100})
+
+    assert declared.status_code == streamed.status_code == 413
+    assert without_key.status_code == 200
+    assert len(calls) == 1
+
+
+async def test_memory_backend_has_no_lru():
+    backend = MemoryBackend(maxsize=None)
+    for i in range(20_000):
+        await backend.set(f"k{i}", b"v", 60)
+    assert await backend.get("k0") == b"v"
+
+
+@pytest.fixture(params=["memory", "redis"])
+async def backend(request):
+    if request.param == "memory":
+        yield MemoryBackend(maxsize=None)
+        return
+    server = FakeRedisServer(port=0)
+    await server.start()
+    redis = RedisBackend(f"redis://127.0.0.1:{server.port}/0")
+    yield redis
+    await redis.close()
+    await server.stop()
+
+
+async def test_compare_and_set_and_delete(backend):
+    assert await backend.set_if_absent("k", b"t1", 60)
+    assert not await backend.compare_and_set("k", b"t2", b"x", 60)
+    assert await backend.compare_and_set("k", b"t1", b"t1x", 60)
+    assert await backend.get("k") == b"t1x"
+    assert not await backend.compare_and_delete("k", b"t1")
+    assert await backend.compare_and_delete("k", b"t1x")
+    assert await backend.get("k") is None
+    assert not await backend.compare_and_set("k", b"t1x", b"y", 60)
@@ -0,0 +1,113 @@
+# tests/test_indexes.py
+"""
+Cada consulta de los repositorios usa su índice (migración 0006), contra Postgres
+(TEST_DATABASE_URL).
+
+Ejecuta los métodos reales, captura el SQL que emiten y lo pasa por EXPLAIN con
+los mismos parámetros. Todo va en una transacción que se deshace: las filas de
+prueba y el ANALYZE no quedan en la BD. Con `enable_seqscan = off` el
+planificador elige índice siempre que alguno sirva: si sale otro (o ninguno), el
+índice previsto no encaja con la forma de la consulta.
+"""
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import orjson
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from repositories.marca_repository import MarcaRepository
+from repositories.metrics_repository import MetricsRepository
+
+SEED_ROWS = 5000
+# ACTIVA es el 5 %: con un estado más repartido, para LIMIT 50 por id el planificador
+# prefiere (con razón) recorrer marcas_pkey y filtrar
+SEED_SQL = """
+    INSERT INTO marcas (titulo, nombre, estado, created_at, approved_at)
+    SELECT 'check-' || g, 'check', e.estado, t.at, CASE WHEN e.estado = 'ACTIVA' THEN t.at END
+    FROM generate_series(1, :n) AS g
+    CROSS JOIN LATERAL (SELECT CASE WHEN g % 20 = 0 THEN 'ACTIVA' ELSE 'INACTIVA' END AS estado) AS e
+    CROSS JOIN LATERAL (SELECT now() - (g % 400) * interval '1 day' AS at) AS t
+"""
+
+marcas, metrics = MarcaRepository(), MetricsRepository()
+now = datetime.now(UTC)
+start_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+next_month = (start_month + timedelta(days=32)).replace(day=1)
+year_ago = now - timedelta(days=365)
+
+# (índice previsto, llamada al repositorio)
+CHECKS = {
+    "last_n_marcas": ("ix_marcas_created_at_id", lambda db: metrics.last_n_marcas(db, 3)),
+    "stats_and_last_n": (
+        "ix_marcas_created_at_id",
+        lambda db: metrics.stats_and_last_n(db, start_month=start_month, next_month=next_month),
+    ),
+    "count_aprobadas_este_mes": (
+        "ix_marcas_approved_activa",
+        lambda db: metrics.count_aprobadas_este_mes(db, start_month=start_month, next_month=next_month),
+    ),
+    "bucket_counts_registros": (
+        "ix_marcas_created_at_id",
+        lambda db: metrics.bucket_counts(
+            db, metric="registros", granularity="month", tz="UTC", start=year_ago, end=now
+        ),
+    ),
+    "bucket_counts_aprobaciones": (
+        "ix_marcas_approved_activa",
+        lambda db: metrics.bucket_counts(
+            db, metric="aprobaciones", granularity="month", tz="UTC", start=year_ago, end=now
+        ),
+    ),
+    "count_pendientes": ("ix_marcas_estado_id", lambda db: metrics.count_pendientes(db)),
+    "list_estado_keyset": (
+        "ix_marcas_estado_id",
+        lambda db: marcas.list_rows(db, estado="ACTIVA", after_id=10, limit=50),
+    ),
+}
+
+
+def _walk(plan: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _walk(child)
+
+
+@pytest.fixture
+async def seeded(pg_engine):
+    """Sesión con filas de prueba, ANALYZE y seqscan desactivado; se deshace al final."""
+    captured: list[tuple[str, Any]] = []
+
+    def capture(_conn, _cursor, statement, parameters, _context, _executemany) -> None:
+        captured.append((statement, parameters))
+
+    async with AsyncSession(pg_engine) as db:
+        try:
+            await db.execute(text(SEED_SQL), {"n": SEED_ROWS})
+            await db.execute(text("ANALYZE marcas"))
+            await db.execute(text("SET LOCAL enable_seqscan = off"))
+            event.listen(pg_engine.sync_engine, "before_cursor_execute", capture)
+            yield db, captured
+        finally:
+            event.remove(pg_engine.sync_engine, "before_cursor_execute", capture)
+            await db.rollback()
+
+
+@pytest.mark.parametrize("name", list(CHECKS))
+async def test_query_uses_index(seeded, name):
+    db, captured = seeded
+    expected, call = CHECKS[name]
+    await call(db)
+    assert captured, "la llamada no emitió SQL"
+
+    raw = await (await db.connection()).get_raw_connection()
+    used: list[str] = []
+    for statement, parameters in captured:
+        # Por el driver, como estimate_count: mismo SQL y mismos parámetros ($n)
+        plan = await raw.driver_connection.fetchval(f"EXPLAIN (FORMAT JSON) {statement}", *(parameters or ()))
+        if isinstance(plan, str):
+            plan = orjson.loads(plan)  # el dialecto asyncpg ya decodifica json; sin su codec llega texto
+        used += [node["Index Name"] for node in _walk(plan[0]["Plan"]) if "Index Name" in node]
+    assert expected in used, f"{name}: plan con {used or 'ningún índice'}"
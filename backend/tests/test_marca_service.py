@@ -0,0 +1,92 @@
+# tests/test_marca_service.py
+"""MarcaService contra Postgres (TEST_DATABASE_URL)."""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from services.index import MarcaService
+
+SEED_SQL = """
+    INSERT INTO marcas (titulo, nombre, estado)
+    SELECT 'estimar-' || g, 'estimar', CASE WHEN g % 2 = 0 THEN 'ACTIVA' ELSE 'INACTIVA' END
+    FROM generate_series(1, 200) AS g
+"""
+
+
+@pytest.fixture
+async def db(pg_engine):
+    async with AsyncSession(pg_engine) as session:
+        try:
+            await session.execute(text(SEED_SQL))
+            await session.execute(text("ANALYZE marcas"))
+            yield session
+        finally:
+            await session.rollback()
+
+
+@pytest.mark.parametrize(
+    ("search", "estado", "summary"),
+    [("estimar", None, True), ("estimar", "ACTIVA", True), (None, "ACTIVA", False)],
+)
+async def test_list_page_with_estimated_total(db, monkeypatch, search, estado, summary):
+    # Con búsqueda (o sin marca_stats) el total sale del EXPLAIN del planificador
+    monkeypatch.setattr(settings, "STATS_SUMMARY_ENABLED", summary)
+    page = await MarcaService().list_marcas_page(
+        db, search=search, estado=estado, limit=10, total="estimate"
+    )
+
+    assert len(page.items) == 10
+    assert page.total_exact is False
+    assert isinstance(page.total, int)
+    assert page.total > 0
+
+
+@pytest.fixture
+async def marca_ids(pg_engine):
+    async with AsyncSession(pg_engine) as session:
+        result = await session.execute(text(
+            "INSERT INTO marcas (titulo, nombre, estado) VALUES ('version-a', 'version', 'INACTIVA'), "
+            "('version-b', 'version', 'INACTIVA') RETURNING id"
+        ))
+        ids = list(result.scalars())
+        await session.commit()
+    yield ids
+    async with AsyncSession(pg_engine) as session:
+        await session.execute(text("DELETE FROM marcas WHERE id = ANY(:ids)"), {"ids": ids})
+        await session.commit()
+
+
+async def test_list_etag_follows_commit_order(pg_engine, marca_ids, monkeypatch):
+    monkeypatch.setattr(settings, "STATS_SUMMARY_ENABLED", True)
+    service = MarcaService()
+    first, second = marca_ids
+    rename = text("UPDATE marcas SET titulo = titulo || '+' WHERE id = :id")
+
+    async def etag() -> str:
+        async with AsyncSession(pg_engine) as session:
+            return await service.list_etag(session, search=None, estado=None)
+
+    async def write_other() -> None:
+        async with AsyncSession(pg_engine) as session:
+            await session.execute(rename, {"id": second})
+            await session.commit()
+
+    before = await etag()
+    async with AsyncSession(pg_engine) as slow:
+        await slow.execute(rename, {"id": first})
+        # Con max(updated_at), la otra escritura confirmaba antes con una hora mayor y
+        # el commit de esta no movía el ETag; ahora espera a que esta termine
+        other = asyncio.create_task(write_other())
+        await asyncio.sleep(0.2)
+        assert not other.done()
+        assert await etag() == before
+        await slow.execute(rename, {"id": first})
+        await slow.commit()
+
+    after_slow = await etag()
+    await asyncio.wait_for(other, 5)
+    after_other = await etag()
+    assert len({before, after_slow, after_other}) == 3
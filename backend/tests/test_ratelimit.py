@@ -0,0 +1,142 @@
+# tests/test_ratelimit.py
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from core import ratelimit
+from core.config import Settings, settings
+from core.ratelimit import (
+    AdmissionGate,
+    AdmissionMiddleware,
+    MemoryRateLimitStore,
+    RedisRateLimitStore,
+)
+from scripts.fake_redis import FakeRedisServer
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    fake = Clock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", fake)
+    return fake
+
+
+async def test_burst_then_refill(clock):
+    store = MemoryRateLimitStore(max_clients=100)
+
+    assert [(await store.take("a", 2.0, 3))[0] for _ in range(4)] == [True, True, True, False]
+    allowed, retry_after = await store.take("a", 2.0, 3)
+    assert not allowed
+    assert retry_after == pytest.approx(0.5)
+    # Otro cliente tiene su propio bucket
+    assert (await store.take("b", 2.0, 3))[0]
+
+    clock.now += 0.5
+    assert (await store.take("a", 2.0, 3))[0]
+    assert not (await store.take("a", 2.0, 3))[0]
+    # La recarga no pasa de `burst`
+    clock.now += 60
+    assert [(await store.take("a", 2.0, 3))[0] for _ in range(4)] == [True, True, True, False]
+
+
+async def test_memory_store_is_bounded(clock):
+    store = MemoryRateLimitStore(max_clients=2)
+    for client in ("a", "b", "c"):
+        await store.take(client, 1.0, 1)
+    assert store.stats()["clients"] == 2
+
+
+async def test_redis_store_window():
+    server = FakeRedisServer(port=0)
+    await server.start()
+    url = f"redis://127.0.0.1:{server.port}/0"
+    store = RedisRateLimitStore(url, timeout=0.5, prefix="prueba", fallback=MemoryRateLimitStore(10))
+    try:
+        results = [await store.take("a", 1.0, 2) for _ in range(3)]
+    finally:
+        await store.close()
+        await server.stop()
+    assert [allowed for allowed, _ in results] == [True, True, False]
+    assert 0 < results[-1][1] <= 2
+
+
+def make_app(calls: list) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/marcas")
+    async def listar():
+        calls.append(1)
+        return []
+
+    @app.post("/marcas")
+    async def crear():
+        raise RuntimeError("fallo")
+
+    return app
+
+
+@pytest.fixture
+def limited(monkeypatch, clock):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_SECOND", 1.0)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 2)
+    monkeypatch.setattr(ratelimit, "_store", MemoryRateLimitStore(100))
+
+
+async def test_429_with_retry_after(limited):
+    calls: list = []
+    transport = httpx.ASGITransport(app=AdmissionMiddleware(make_app(calls)))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        statuses = [(await client.get("/marcas")).status_code for _ in range(2)]
+        rejected = await client.get("/marcas")
+        exempt = await client.get("/openapi.json")
+        other_client = await client.get("/marcas", headers={settings.RATE_LIMIT_KEY_HEADER: "otra"})
+
+    assert statuses == [200, 200]
+    assert rejected.status_code == 429
+    assert rejected.headers["retry-after"] == "1"
+    assert exempt.status_code == 200
+    assert other_client.status_code == 200
+    assert len(calls) == 3
+
+
+def test_rate_limit_off_by_default():
+    assert Settings.model_fields["RATE_LIMIT_ENABLED"].default is False
+
+
+async def test_gate_released_after_exception(monkeypatch):
+    gate = AdmissionGate("write", limit=1, queue_size=0, timeout=0.1)
+    monkeypatch.setitem(ratelimit.gates, "write", gate)
+    monkeypatch.setattr(settings, "ADMISSION_ENABLED", True)
+    transport = httpx.ASGITransport(app=AdmissionMiddleware(make_app([])))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                await client.post("/marcas")
+
+    assert gate.active == 0
+    assert gate.admitted == 3
+    assert await asyncio.wait_for(gate.acquire(), 0.1)
+
+
+async def test_gate_queue_full_and_timeout():
+    gate = AdmissionGate("read", limit=1, queue_size=1, timeout=0.05)
+    assert await gate.acquire()
+    waiter = asyncio.create_task(gate.acquire())
+    await asyncio.sleep(0)
+    assert not await gate.acquire()  # cola llena: rechazo inmediato
+    assert not await waiter  # esperó más que `timeout`
+    gate.release()
+    assert await gate.acquire()
+    assert gate.stats()["rejected_queue_full"] == 1
+    assert gate.stats()["rejected_timeout"] == 1
@@ -0,0 +1,101 @@
+# tests/test_read_replicas.py
+"""Lo leído de una réplica no rellena las cachés compartidas (ver bd.session.primary_session)."""
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bd import session as bd_session
+from core.cache import SharedCache
+from core.cache_backend import MemoryBackend
+from models.index import Marca
+from schemas.Marca import Marca as MarcaSchema
+from services.index import MarcaService
+from services.metrics_service import MetricsService
+
+
+class RecordingMarcaRepo:
+    def __init__(self) -> None:
+        self.sessions: list[AsyncSession] = []
+
+    async def get(self, db: AsyncSession, marca_id: int) -> Marca:
+        self.sessions.append(db)
+        return Marca(id=marca_id, titulo="t", nombre="n", estado="ACTIVA")
+
+
+class RecordingMetricsRepo:
+    def __init__(self) -> None:
+        self.sessions: list[AsyncSession] = []
+
+    async def bucket_counts(self, db: AsyncSession, **_: object) -> list:
+        self.sessions.append(db)
+        return []
+
+
+def make_cache(name: str, model: type[BaseModel] | None = None) -> SharedCache:
+    return SharedCache(name, ttl=60, maxsize=100, backend=MemoryBackend(), model=model)
+
+
+@pytest.fixture
+def primary(monkeypatch) -> async_sessionmaker:
+    # Sin engine: los repositorios falsos no abren conexión
+    factory = async_sessionmaker(info={"primary": True})
+    monkeypatch.setattr(bd_session, "AsyncSessionLocal", factory)
+    return factory
+
+
+def replica_session() -> AsyncSession:
+    return AsyncSession(info={"replica": "replica0"})
+
+
+async def test_marca_cache_miss_loads_from_primary(primary):
+    repo = RecordingMarcaRepo()
+    service = MarcaService(repo=repo, cache=make_cache("marcas-prueba", MarcaSchema))
+
+    first = await service.get_marca(replica_session(), 7)
+    again = await service.get_marca(replica_session(), 7)
+
+    assert first == again
+    assert len(repo.sessions) == 1
+    assert repo.sessions[0].info.get("primary")
+
+
+async def test_primary_session_keeps_primary(primary):
+    repo = RecordingMarcaRepo()
+    service = MarcaService(repo=repo, cache=make_cache("marcas-prueba", MarcaSchema))
+    db = AsyncSession()
+
+    await service.get_marca(db, 7)
+
+    assert repo.sessions == [db]
+
+
+async def test_stats_cache_miss_loads_from_primary(primary, monkeypatch):
+    service = MetricsService(cache=make_cache("stats-prueba"))
+    used: list[AsyncSession] = []
+
+    async def compute_stats(db: AsyncSession) -> dict:
+        used.append(db)
+        return {"total": 1}
+
+    monkeypatch.setattr(service, "compute_stats", compute_stats)
+    await service.get_stats_and_last3(replica_session())
+
+    assert [db.info.get("primary") for db in used] == [True]
+
+
+@pytest.mark.parametrize(("days", "closed_from_primary"), [(3, True), (0, False)])
+async def test_series_closed_buckets_from_primary(primary, days, closed_from_primary):
+    repo = RecordingMetricsRepo()
+    service = MetricsService(repo=repo, analytics_cache=make_cache("analytics-prueba"))
+    db = replica_session()
+    hasta = datetime.now(UTC).date()
+
+    # Solo el bucket actual (no se cachea) puede leerse de la réplica
+    await service.get_series(
+        db, metric="registros", granularity="day", tz="UTC", desde=hasta - timedelta(days=days), hasta=hasta
+    )
+
+    assert len(repo.sessions) == 1
+    assert (repo.sessions[0] is not db) is closed_from_primary
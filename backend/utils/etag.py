@@ -0,0 +1,63 @@
+import hashlib
+from datetime import UTC, datetime, timedelta
+
+# ETags fuertes.
+#   Marca:      "<id>.<updated_at en µs desde epoch>" (reversible: If-Match -> WHERE updated_at = ...)
+#   Colección:  hash de (count, max(updated_at), parámetros de la página)
+#   Payloads:   hash del cuerpo ya serializado (/detalles)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class PreconditionFailed(Exception):
+    """If-Match no coincide con la versión actual del recurso (HTTP 412)."""
+
+
+def marca_etag(marca_id: int, updated_at: datetime) -> str:
+    if updated_at.tzinfo is None:
+        # SQLite (benchmarks) devuelve timestamps naive, en UTC
+        updated_at = updated_at.replace(tzinfo=UTC)
+    return f'"{marca_id}.{(updated_at - EPOCH) // _MICROSECOND}"'
+
+
+def hash_etag(*parts: object) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def payload_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def _split(header: str) -> list[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def none_match(header: str | None, etag: str) -> bool:
+    """True si If-None-Match coincide (comparación débil, RFC 9110): responder 304."""
+    if not header:
+        return False
+    tags = _split(header)
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+def if_match_versions(header: str | None, marca_id: int) -> list[datetime] | None:
+    """
+    Traduce If-Match a las versiones (updated_at) aceptadas para `marca_id`.
+    None = sin precondición (cabecera ausente o "*"); lista vacía = ningún ETag
+    aplicable, la petición debe fallar con 412. Comparación fuerte: W/ no cuenta.
+    """
+    if not header:
+        return None
+    tags = _split(header)
+    if "*" in tags:
+        return None
+    versions: list[datetime] = []
+    for tag in tags:
+        if not (tag.startswith('"') and tag.endswith('"')):
+            continue
+        tag_id, _, micros = tag[1:-1].partition(".")
+        if tag_id == str(marca_id) and micros.isdigit():
+            versions.append(EPOCH + int(micros) * _MICROSECOND)
+    return versions
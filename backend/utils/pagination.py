@@ -0,0 +1,22 @@
+import base64
+import binascii
+
+import orjson
+
+# Cursor opaco para paginación keyset: base64url(json({"id": <último id>}))
+
+def encode_cursor(last_id: int) -> str:
+    raw = orjson.dumps({"id": last_id})
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        data = orjson.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, orjson.JSONDecodeError):
+        raise ValueError("Cursor inválido") from None
+    last_id: int | None = data.get("id") if isinstance(data, dict) else None
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise ValueError("Cursor inválido")
+    return last_id